@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Blob document states; documents written before states existed are ready
+PENDING, READY, DELETING = "pending", "ready", "deleting"
+EPOCH = datetime.fromtimestamp(0, timezone.utc).isoformat()
+
+
+def hash_file(path, chunk_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class StoredBlob:
+    created: bool
+    codec: Optional[str]
+    stored_size: int
+
+
+class BlobStore:
+    """Content-addressed file storage with reference counting.
+
+    Blobs are stored under the key ``<prefix>/<sha256[:2]>/<sha256>`` in
+    ``storage`` and every blob has a document in ``collection`` holding its
+    ``refCount`` and ``state``. The document, not the stored object, decides
+    whether a blob exists, and each step changes it with one atomic update,
+    so any number of processes sharing the collection and storage can add
+    and release the same blob concurrently.
+
+    The first ``add`` of some content inserts the document as ``pending``,
+    stores the object and marks it ``ready``; later adds only bump the count,
+    waiting for a pending blob to become ready. ``release`` never deletes: a
+    blob left without references is kept for ``grace`` seconds, during which
+    an add revives it, and is then deleted by ``collect``. A process storing
+    or deleting a blob holds it for at most ``lease`` seconds before another
+    may take over.
+    """
+
+    def __init__(self, collection, storage, prefix: str = "blobs", grace: float = 3600, lease: float = 900):
+        self.collection = collection
+        self.storage = storage
+        self.prefix = prefix
+        self.grace = grace
+        self.lease = lease
+        self.poll_interval = 0.5
+
+    def key(self, digest: str) -> str:
+        # Also what files.fileName holds for blob-backed files
+        return f"{self.prefix}/{digest[:2]}/{digest}"
+
+    def derivative_key(self, digest: str, name: str) -> str:
+        # Objects derived from a blob live beside it and are deleted with it
+        return f"{self.key(digest)}.{name}"
+
+    async def add(
+        self,
+        source: Path,
+        digest: str,
+        size: int,
+        keep_source: bool = False,
+        codec: Optional[str] = None,
+        stored_size: Optional[int] = None
+    ) -> StoredBlob:
+        """Store ``source`` under ``digest`` and take a reference to it.
+
+        ``source`` is moved into storage, or discarded when the blob already
+        exists. With ``keep_source`` it is copied instead and left in place.
+        ``codec`` names the compression ``source`` is stored with. The result
+        describes the blob actually kept, which for existing content may use a
+        different codec than ``source``.
+        """
+        blob = {"size": size, "codec": codec, "storedSize": stored_size if stored_size is not None else size}
+        existing = await self._reference(digest, blob)
+        try:
+            if existing is None:
+                await self._store(digest, source, keep_source)
+                return StoredBlob(created=True, codec=codec, stored_size=blob['storedSize'])
+
+            if existing.get('state', READY) != READY:
+                existing = await self._wait_until_ready(digest, source, keep_source, blob)
+                if existing is None:
+                    return StoredBlob(created=True, codec=codec, stored_size=blob['storedSize'])
+        except Exception:
+            await self.release(digest)
+            raise
+
+        if not keep_source:
+            await anyio.to_thread.run_sync(lambda: Path(source).unlink(missing_ok=True))
+        return StoredBlob(
+            created=False,
+            codec=existing.get('codec'),
+            stored_size=existing.get('storedSize', existing.get('size', size))
+        )
+
+    async def _reference(self, digest: str, blob: dict) -> Optional[dict]:
+        # Take a reference, inserting a pending document for new content.
+        # Returns the document as it was before, or None when it was inserted
+        deadline = time.monotonic() + self.lease
+        while True:
+            now = _now().isoformat()
+            try:
+                return await self.collection.find_one_and_update(
+                    {"_id": digest, "state": {"$ne": DELETING}},
+                    {
+                        "$inc": {"refCount": 1},
+                        "$unset": {"releasedAt": ""},
+                        "$setOnInsert": {**blob, "state": PENDING, "pendingSince": now, "createdAt": now}
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.BEFORE
+                )
+            except DuplicateKeyError:
+                # collect is deleting this blob; add it afresh once the document is gone
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(self.poll_interval)
+
+    async def _store(self, digest: str, source: Path, keep_source: bool):
+        try:
+            await self.storage.put(self.key(digest), source, keep_source=keep_source)
+        except Exception:
+            # Expire the lease so an add waiting on this blob stores its own copy
+            await self.collection.update_one({"_id": digest, "state": PENDING}, {"$set": {"pendingSince": EPOCH}})
+            raise
+        await self.collection.update_one(
+            {"_id": digest, "state": PENDING},
+            {"$set": {"state": READY}, "$unset": {"pendingSince": ""}}
+        )
+
+    async def _wait_until_ready(self, digest: str, source: Path, keep_source: bool, blob: dict) -> Optional[dict]:
+        # Another add is storing this content. Wait for it, or store our copy
+        # if it failed or its lease ran out; returns None in that case
+        while True:
+            doc = await self.collection.find_one({"_id": digest})
+            if doc.get('state', READY) == READY:
+                return doc
+            expired = (_now() - timedelta(seconds=self.lease)).isoformat()
+            if doc.get('pendingSince', EPOCH) < expired:
+                taken = await self.collection.update_one(
+                    {"_id": digest, "state": PENDING, "pendingSince": doc.get('pendingSince')},
+                    {"$set": {**blob, "pendingSince": _now().isoformat()}}
+                )
+                if taken.modified_count:
+                    await self._store(digest, source, keep_source)
+                    return None
+            await asyncio.sleep(self.poll_interval)
+
+    async def release(self, digest: str):
+        """Drop one reference. Blobs left unreferenced are deleted by ``collect``."""
+        blob = await self.collection.find_one_and_update(
+            {"_id": digest},
+            {"$inc": {"refCount": -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if blob and blob['refCount'] <= 0:
+            # Starts the grace period, unless an add revived the blob in between
+            await self.collection.update_one(
+                {"_id": digest, "refCount": {"$lte": 0}},
+                {"$set": {"releasedAt": _now().isoformat()}}
+            )
+
+    async def collect(self) -> int:
+        """Delete blobs that have been unreferenced for ``grace`` seconds.
+
+        Safe to run from several processes at once; each blob is claimed by
+        one of them. Returns the number of blobs deleted.
+        """
+        now = _now()
+        # Released by a process that stopped before recording when
+        await self.collection.update_many(
+            {"refCount": {"$lte": 0}, "releasedAt": {"$exists": False}, "state": {"$ne": DELETING}},
+            {"$set": {"releasedAt": now.isoformat()}}
+        )
+
+        # Also picks up deletions whose process stopped partway (nothing adds to a deleting blob)
+        claimable = {"refCount": {"$lte": 0}, "$or": [
+            {"releasedAt": {"$lt": (now - timedelta(seconds=self.grace)).isoformat()}, "state": {"$ne": DELETING}},
+            {"state": DELETING, "deletingSince": {"$lt": (now - timedelta(seconds=self.lease)).isoformat()}}
+        ]}
+        deleted = 0
+        for doc in await self.collection.find(claimable, {"_id": 1}).to_list(None):
+            digest = doc['_id']
+            claimed = await self.collection.find_one_and_update(
+                {"_id": digest, **claimable},
+                {"$set": {"state": DELETING, "deletingSince": now.isoformat()}}
+            )
+            if not claimed:
+                continue
+            # Objects go first: adds wait until the document is gone
+            await self.storage.delete_prefix(f"{self.key(digest)}.")
+            await self.storage.delete(self.key(digest))
+            await self.collection.delete_one({"_id": digest, "state": DELETING})
+            deleted += 1
+        return deleted
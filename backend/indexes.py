@@ -0,0 +1,130 @@
+import logging
+import threading
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, monitoring
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Every index the API's queries rely on, per collection
+REQUIRED_INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True,
+                   partialFilterExpression={"email": {"$type": "string"}}),
+        IndexModel([("phoneNumber", ASCENDING)], name="phoneNumber_unique", unique=True,
+                   partialFilterExpression={"phoneNumber": {"$type": "string"}}),
+    ],
+    "files": [
+        IndexModel([("userId", ASCENDING), ("uploadedAt", DESCENDING), ("_id", DESCENDING)], name="userId_uploadedAt"),
+        IndexModel([("userId", ASCENDING), ("originalName", TEXT)], name="userId_text"),
+    ],
+    "notes": [
+        IndexModel([("userId", ASCENDING), ("updatedAt", DESCENDING), ("_id", DESCENDING)], name="userId_updatedAt"),
+        # Text search is scoped per user; titles weigh more than body matches
+        IndexModel([("userId", ASCENDING), ("title", TEXT), ("content", TEXT)], name="userId_text",
+                   weights={"title": 5, "content": 1}),
+    ],
+    "texts": [
+        IndexModel([("userId", ASCENDING), ("updatedAt", DESCENDING), ("_id", DESCENDING)], name="userId_updatedAt"),
+        IndexModel([("userId", ASCENDING), ("title", TEXT), ("content", TEXT)], name="userId_text",
+                   weights={"title": 5, "content": 1}),
+    ],
+    "blobs": [
+        # Only unreferenced blobs, which the cleanup task scans for
+        IndexModel([("refCount", ASCENDING)], name="unreferenced",
+                   partialFilterExpression={"refCount": {"$lte": 0}}),
+    ],
+    "upload_sessions": [
+        IndexModel([("userId", ASCENDING)], name="userId"),
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt"),
+    ],
+}
+
+
+async def ensure_indexes(db, slow_query_logger=None) -> dict:
+    """Create any missing required indexes.
+
+    Failures (e.g. duplicate emails blocking a unique index) are logged and
+    skipped so the API still starts. Returns ``{collection: [missing names]}``
+    for indexes that could not be created.
+    """
+    missing = {}
+    for collection, models in REQUIRED_INDEXES.items():
+        for model in models:
+            name = model.document['name']
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                logger.error(f"Could not create index {collection}.{name}: {e}")
+                missing.setdefault(collection, []).append(name)
+
+        if slow_query_logger:
+            indexes = await db[collection].index_information()
+            slow_query_logger.set_indexes(collection, [info['key'] for info in indexes.values()])
+    return missing
+
+
+def _filter_fields(command_name: str, command: dict):
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        query = pipeline[0].get("$match", {})
+    elif command_name in ("find", "count", "findAndModify"):
+        query = command.get("filter") or command.get("query") or {}
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or [{}]
+        query = statements[0].get("q", {})
+    else:
+        return None
+    return [key for key in query if not key.startswith("$")]
+
+
+class SlowQueryLogger(monitoring.CommandListener):
+    """Logs MongoDB commands slower than ``threshold_ms``.
+
+    A slow query whose filter fields do not lead any existing index is
+    flagged, naming the required index it would have used if one is declared.
+    """
+
+    def __init__(self, threshold_ms: float):
+        self.threshold_ms = threshold_ms
+        self._pending = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def set_indexes(self, collection: str, keys):
+        self._indexes[collection] = [[field for field, _ in key] for key in keys]
+
+    def started(self, event):
+        fields = _filter_fields(event.command_name, event.command)
+        if fields is None:
+            return
+        collection = event.command.get(event.command_name)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (collection, fields)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        collection, fields = pending
+        message = f"Slow query: {event.command_name} on {event.database_name}.{collection} filter={fields} took {duration_ms:.1f}ms"
+        indexed = "_id" in fields or any(keys and keys[0] in fields for keys in self._indexes.get(collection, []))
+        if fields and not indexed:
+            wanted = [
+                model.document['name'] for model in REQUIRED_INDEXES.get(collection, [])
+                if next(iter(model.document['key'])) in fields
+            ]
+            message += f" - no usable index (missing: {', '.join(wanted) or 'none declared'})"
+        logger.warning(message)
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LAG_QUANTILES = (0.5, 0.9, 0.99)
+STACK_DEPTH = 20  # innermost frames logged for a blocking call
+
+
+class LoopMonitor:
+    """Measures event loop lag and logs what is blocking the loop.
+
+    A task sleeps ``interval`` seconds at a time and records how late it
+    wakes up. A watchdog thread checks the same deadline; once the loop is
+    more than ``threshold`` seconds late it captures the loop thread's stack,
+    which is the code still blocking it. When the loop recovers, the stall is
+    logged with that stack. Lag is exported as a histogram and as quantiles
+    over the last ``window`` samples.
+    """
+
+    def __init__(self, registry, threshold: float, interval: float = 0.05, window: int = 1200):
+        self.threshold = threshold
+        self.interval = interval
+        self._samples = deque(maxlen=window)
+        self._deadline = None
+        self._stack = None
+        self._loop_thread = None
+        self._task = None
+        self._stop = threading.Event()
+
+        self.lag = registry.histogram("event_loop_lag_seconds", "How late the event loop ran a timer", buckets=LAG_BUCKETS)
+        self.lag_quantiles = registry.gauge(
+            "event_loop_lag_quantile_seconds", "Event loop lag quantiles over the recent window", ["quantile"]
+        )
+        self.blocks = registry.counter("event_loop_blocks_total", "Times the event loop was blocked beyond the threshold")
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._measure())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    async def _measure(self):
+        published = time.monotonic()
+        while True:
+            expected = time.monotonic() + self.interval
+            self._deadline = expected + self.threshold
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._deadline = None
+
+            self._samples.append(lag)
+            self.lag.observe(lag)
+            if lag >= self.threshold:
+                self.blocks.inc()
+                stack, self._stack = self._stack, None
+                logger.warning(
+                    f"Event loop blocked for {lag * 1000:.0f}ms"
+                    + (f"; blocking call:\n{stack}" if stack else " (blocking call finished before it was sampled)")
+                )
+            if now - published >= 1:
+                self._publish_quantiles()
+                published = now
+
+    def _publish_quantiles(self):
+        ordered = sorted(self._samples)
+        for q in LAG_QUANTILES:
+            self.lag_quantiles.set(ordered[min(len(ordered) - 1, int(q * len(ordered)))], quantile=q)
+
+    def _watch(self):
+        # Runs on its own thread, so it keeps going while the loop is stuck
+        captured_for = None
+        while not self._stop.wait(self.threshold / 2):
+            deadline = self._deadline
+            if deadline is None or deadline == captured_for or time.monotonic() < deadline:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._stack = ''.join(traceback.format_stack(frame, limit=STACK_DEPTH))
+                captured_for = deadline
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Maintenance commands for the Ecoleaf Cloud backend.
+
+Run from the backend directory, e.g. ``python manage.py migrate-blobs --dry-run``.
+"""
+import argparse
+import asyncio
+import logging
+
+import anyio
+
+from blob_store import hash_file
+from indexes import ensure_indexes
+from server import UPLOAD_DIR, blob_store, client, db, thumbnail_generator, usage_counters
+
+logger = logging.getLogger("manage")
+
+
+async def migrate_blobs(dry_run: bool):
+    """Move legacy per-upload files into the content-addressed blob store.
+
+    Legacy files are read from UPLOAD_DIR and stored with the configured
+    STORAGE_BACKEND, so this also copies them into an object store.
+    """
+    migrated = deduplicated = missing = 0
+    referenced = set()
+
+    async for file_doc in db.files.find({"blobHash": {"$exists": False}}):
+        legacy_path = UPLOAD_DIR / file_doc['fileName']
+        if not await anyio.to_thread.run_sync(legacy_path.exists):
+            logger.warning(f"Missing file for {file_doc['_id']}: {legacy_path}")
+            missing += 1
+            continue
+
+        referenced.add(legacy_path.name)
+        digest = await anyio.to_thread.run_sync(hash_file, legacy_path)
+        if dry_run:
+            logger.info(f"Would migrate {file_doc['fileName']} -> {blob_store.key(digest)}")
+            migrated += 1
+            continue
+
+        # Link the blob in first, repoint the document, and only then drop the
+        # legacy file, so an interrupted run never leaves a dangling document
+        blob = await blob_store.add(legacy_path, digest, file_doc.get('fileSize', 0), keep_source=True)
+        new_filename = blob_store.key(digest)
+        update = {
+            "sha256": digest,
+            "blobHash": digest,
+            "fileName": new_filename,
+            "codec": blob.codec,
+            "storedSize": blob.stored_size
+        }
+        if thumbnail_generator.wants(file_doc.get('fileType')) and 'thumbnails' not in file_doc:
+            # Rendered by the server, which resumes pending thumbnails at startup
+            update["thumbnails"] = {"status": "pending"}
+        await db.files.update_one({"_id": file_doc['_id']}, {"$set": update})
+        await anyio.to_thread.run_sync(legacy_path.unlink)
+
+        migrated += 1
+        if not blob.created:
+            deduplicated += 1
+
+    # Loose files that no document points at are reported, never deleted
+    orphans = [
+        p.name for p in UPLOAD_DIR.iterdir()
+        if p.is_file() and p.name.startswith('file-') and p.name not in referenced
+    ]
+
+    action = "Would migrate" if dry_run else "Migrated"
+    logger.info(f"{action} {migrated} files ({deduplicated} deduplicated), {missing} missing on disk")
+    if orphans:
+        logger.warning(f"{len(orphans)} files in {UPLOAD_DIR} are not referenced by any document: {orphans[:20]}")
+
+
+async def reconcile_usage(user_id, dry_run: bool):
+    """Rebuild user_usage counters from the source collections and report drift."""
+    query = {"_id": user_id} if user_id else {}
+    checked = drifted = 0
+
+    async for user in db.users.find(query, {"_id": 1}):
+        had_counters = await usage_counters.collection.count_documents({"_id": user['_id']}) > 0
+        _, drift = await usage_counters.rebuild(user['_id'], dry_run=dry_run)
+        checked += 1
+        if had_counters and drift:
+            drifted += 1
+            for d in drift:
+                logger.warning(f"{user['_id']}: {d['field']} stored={d['stored']} actual={d['actual']}")
+
+    action = "Checked" if dry_run else "Rebuilt"
+    logger.info(f"{action} usage counters for {checked} users, {drifted} had drifted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate-blobs", help="Move existing uploads into the deduplicating blob store")
+    migrate.add_argument("--dry-run", action="store_true", help="Report what would change without touching anything")
+
+    reconcile = commands.add_parser("reconcile-usage", help="Rebuild per-user usage counters and report drift")
+    reconcile.add_argument("--user", help="Only reconcile this user id")
+    reconcile.add_argument("--dry-run", action="store_true", help="Report drift without rewriting counters")
+
+    commands.add_parser("ensure-indexes", help="Create the indexes the API relies on")
+
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            if args.command == "migrate-blobs":
+                await migrate_blobs(args.dry_run)
+            elif args.command == "reconcile-usage":
+                await reconcile_usage(args.user, args.dry_run)
+            elif args.command == "ensure-indexes":
+                missing = await ensure_indexes(db)
+                if missing:
+                    raise SystemExit(f"Indexes could not be created: {missing}")
+                logger.info("All required indexes are in place")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
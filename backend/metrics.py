@@ -0,0 +1,322 @@
+import bisect
+import threading
+import time
+
+from pymongo import monitoring
+
+# Latency buckets in seconds, from a cache hit to a slow bcrypt or upload
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    """A total that only goes up; ``function`` reads one kept elsewhere at scrape time."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        if self.function is not None:
+            with self._lock:
+                self._values[()] = self.function()
+        yield from super().render()
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; ``function`` samples it at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        if self.function is not None:
+            self.set(self.function())
+        yield from super().render()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        for key, (counts, total) in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text exposition format."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=(), function=None) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name: str, documentation: str, labelnames=(), function=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency, response sizes and
+    in-flight requests.
+
+    Requests are labelled with the route template (``/api/files/{file_id}``)
+    rather than the raw path, so ids do not create new series; requests that
+    match no route share the ``unmatched`` label.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.requests = registry.counter(
+            "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+        )
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "Time from request start to the last response byte", ["method", "route"]
+        )
+        self.response_size = registry.histogram(
+            "http_response_size_bytes", "Response body size", ["method", "route"], buckets=SIZE_BUCKETS
+        )
+        self.in_flight = registry.gauge("http_requests_in_flight", "Requests being handled", ["method"])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        state = {"status": 500, "size": 0, "length": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-length":
+                        state["length"] = int(value)
+            elif message["type"] == "http.response.body":
+                state["size"] += len(message.get("body", b""))
+            elif message["type"] == "http.response.zerocopysend":
+                state["size"] += message.get("count") or 0
+            elif message["type"] == "http.response.pathsend":
+                state["size"] += state["length"]
+            await send(message)
+
+        self.in_flight.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight.dec(method=method)
+            # Filled in by the router once a route matched
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.requests.inc(method=method, route=route, status=state["status"])
+            self.latency.observe(elapsed, method=method, route=route)
+            self.response_size.observe(state["size"], method=method, route=route)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Records MongoDB command durations per collection and command."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.duration = registry.histogram(
+            "mongodb_command_duration_seconds", "MongoDB command round trip time", ["collection", "command"]
+        )
+        self.failures = registry.counter(
+            "mongodb_command_failures_total", "MongoDB commands that failed", ["collection", "command"]
+        )
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "")
+        self.duration.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name)
+        if failed:
+            self.failures.inc(collection=collection, command=event.command_name)
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Records MongoDB connection pool usage and how long checkouts wait.
+
+    A checkout starts and completes on the same thread, so the wait is timed
+    per thread.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.wait = registry.histogram(
+            "mongodb_pool_wait_seconds", "Time spent waiting to check out a pooled connection", ["address"]
+        )
+        self.waiting = registry.gauge("mongodb_pool_waiting", "Operations waiting for a pooled connection", ["address"])
+        self.connections = registry.gauge("mongodb_pool_connections", "Open pooled connections", ["address"])
+        self.in_use = registry.gauge("mongodb_pool_in_use", "Pooled connections checked out", ["address"])
+        self.failures = registry.counter(
+            "mongodb_pool_checkout_failures_total", "Connection checkouts that failed", ["address", "reason"]
+        )
+        self._started = threading.local()
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def connection_check_out_started(self, event):
+        self._started.at = time.perf_counter()
+        self.waiting.inc(address=self._address(event))
+
+    def _check_out_finished(self, event):
+        address = self._address(event)
+        self.waiting.dec(address=address)
+        started = getattr(self._started, 'at', None)
+        if started is not None:
+            self.wait.observe(time.perf_counter() - started, address=address)
+            self._started.at = None
+        return address
+
+    def connection_checked_out(self, event):
+        self.in_use.inc(address=self._check_out_finished(event))
+
+    def connection_check_out_failed(self, event):
+        self.failures.inc(address=self._check_out_finished(event), reason=event.reason)
+
+    def connection_checked_in(self, event):
+        self.in_use.dec(address=self._address(event))
+
+    def connection_created(self, event):
+        self.connections.inc(address=self._address(event))
+
+    def connection_closed(self, event):
+        self.connections.dec(address=self._address(event))
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
@@ -0,0 +1,95 @@
+import os
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from pymongo import read_preferences
+
+READ_PREFERENCES = {
+    "primary": read_preferences.Primary,
+    "primaryPreferred": read_preferences.PrimaryPreferred,
+    "secondary": read_preferences.Secondary,
+    "secondaryPreferred": read_preferences.SecondaryPreferred,
+    "nearest": read_preferences.Nearest,
+}
+
+# The smallest maxStalenessSeconds MongoDB accepts
+MIN_MAX_STALENESS = 90
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else None
+
+
+@dataclass(frozen=True)
+class MongoSettings:
+    """Connection pool, wire compression and read routing for the Motor client.
+
+    Loaded from ``MONGO_*`` environment variables. Unset options are left
+    out of ``client_options`` so pymongo's defaults, or options given in the
+    connection string, still apply. ``read_preference`` is used only for the
+    read-only endpoints that can tolerate ``max_staleness_seconds`` of lag.
+    """
+
+    max_pool_size: Optional[int] = None
+    min_pool_size: Optional[int] = None
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    connect_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: Optional[int] = None
+    socket_timeout_ms: Optional[int] = None
+    compressors: Optional[str] = None
+    app_name: Optional[str] = None
+    read_preference_mode: str = "primary"
+    max_staleness_seconds: int = MIN_MAX_STALENESS
+
+    def __post_init__(self):
+        if self.read_preference_mode not in READ_PREFERENCES:
+            raise ValueError(
+                f"Unknown MONGO_READ_PREFERENCE: {self.read_preference_mode} "
+                f"(expected one of {', '.join(READ_PREFERENCES)})"
+            )
+        if self.max_staleness_seconds != -1 and self.max_staleness_seconds < MIN_MAX_STALENESS:
+            raise ValueError(f"MONGO_MAX_STALENESS_SECONDS must be -1 (no limit) or at least {MIN_MAX_STALENESS}")
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        return cls(
+            max_pool_size=_env_int('MONGO_MAX_POOL_SIZE'),
+            min_pool_size=_env_int('MONGO_MIN_POOL_SIZE'),
+            max_idle_time_ms=_env_int('MONGO_MAX_IDLE_TIME_MS'),
+            wait_queue_timeout_ms=_env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+            connect_timeout_ms=_env_int('MONGO_CONNECT_TIMEOUT_MS'),
+            server_selection_timeout_ms=_env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+            socket_timeout_ms=_env_int('MONGO_SOCKET_TIMEOUT_MS'),
+            compressors=os.environ.get('MONGO_COMPRESSORS') or None,
+            app_name=os.environ.get('MONGO_APP_NAME') or None,
+            read_preference_mode=os.environ.get('MONGO_READ_PREFERENCE') or "primary",
+            max_staleness_seconds=_env_int('MONGO_MAX_STALENESS_SECONDS') or MIN_MAX_STALENESS
+        )
+
+    def client_options(self) -> dict:
+        # MongoClient keyword names; these take precedence over the connection string
+        names = {
+            "max_pool_size": "maxPoolSize",
+            "min_pool_size": "minPoolSize",
+            "max_idle_time_ms": "maxIdleTimeMS",
+            "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+            "connect_timeout_ms": "connectTimeoutMS",
+            "server_selection_timeout_ms": "serverSelectionTimeoutMS",
+            "socket_timeout_ms": "socketTimeoutMS",
+            "compressors": "compressors",
+            "app_name": "appname",
+        }
+        return {
+            names[f.name]: getattr(self, f.name)
+            for f in fields(self)
+            if f.name in names and getattr(self, f.name) is not None
+        }
+
+    def read_preference(self):
+        """Read preference for staleness-tolerant reads."""
+        mode = READ_PREFERENCES[self.read_preference_mode]
+        if mode is read_preferences.Primary:
+            return mode()
+        return mode(max_staleness=self.max_staleness_seconds)
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+@dataclass
+class HashTiming:
+    wait_ms: float
+    hash_ms: float
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, so ``workers`` threads can use up to
+    ``workers`` CPU cores. Requests beyond ``max_queue`` pending jobs are
+    rejected immediately instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        # Jobs submitted but not yet picked up by a worker
+        return max(0, self._pending - self.workers)
+
+    @property
+    def in_flight(self) -> int:
+        return self._pending
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            raise PasswordHasherBusy()
+
+        with self._lock:
+            self._pending += 1
+        submitted = time.perf_counter()
+        started = {}
+
+        def job():
+            started['at'] = time.perf_counter()
+            return fn(*args)
+
+        # Counted until the job itself finishes (or is cancelled before it
+        # starts): a cancelled request does not stop a hash already running
+        future = self._executor.submit(job)
+        future.add_done_callback(self._job_done)
+        result = await asyncio.wrap_future(future)
+
+        finished = time.perf_counter()
+        timing = HashTiming(
+            wait_ms=(started['at'] - submitted) * 1000,
+            hash_ms=(finished - started['at']) * 1000
+        )
+        return result, timing
+
+    def _job_done(self, future):
+        # Runs on the worker thread
+        with self._lock:
+            self._pending -= 1
+
+    async def hash(self, password: str):
+        return await self._run(lambda pw: bcrypt.hashpw(pw, bcrypt.gensalt()).decode(), password.encode())
+
+    async def verify(self, password: str, password_hash: str):
+        return await self._run(bcrypt.checkpw, password.encode(), password_hash.encode())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
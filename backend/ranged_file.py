@@ -0,0 +1,195 @@
+import re
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+import anyio
+from starlette.responses import Response
+
+from storage import content_disposition
+from storage_codec import decoding_reader
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+
+def _parse_date(value: str):
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_range(header: str, size: int):
+    """Return ``(start, end)`` inclusive, ``None`` to ignore the header, or
+    ``False`` when the range cannot be satisfied.
+
+    Only single ranges are served; multi-range requests get the whole file,
+    which RFC 9110 allows.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, end
+
+
+class RangedFileResponse(Response):
+    """File response with conditional GET and single-range support.
+
+    Answers ``If-None-Match``/``If-Modified-Since`` with 304 and ``Range``
+    (honouring ``If-Range``) with 206 or 416. ``key`` is read from
+    ``storage``; local files go out through the ASGI ``zerocopysend``/
+    ``pathsend`` extensions when the server offers them, anything else is
+    read in chunks on a worker thread. Files stored with a
+    ``codec`` are decompressed as they are streamed; ``size`` is then the
+    decompressed size and ranges apply to the decompressed bytes.
+    """
+
+    def __init__(
+        self,
+        storage,
+        key: str,
+        request,
+        *,
+        size: int,
+        media_type: str,
+        etag: str,
+        last_modified: datetime,
+        cache_control: str,
+        filename: str = None,
+        inline: bool = False,
+        chunk_size: int = 1024 * 1024,
+        codec: str = None
+    ):
+        self.storage = storage
+        self.key = key
+        self.chunk_size = chunk_size
+        self.codec = codec
+        self.background = None
+        self.send_body = request.method != 'HEAD'
+        self.range = None
+        self.status_code = 200
+
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": format_datetime(last_modified, usegmt=True),
+            "cache-control": cache_control,
+        }
+        if filename is not None:
+            headers["content-disposition"] = content_disposition(filename, inline)
+
+        if self._not_modified(request.headers, etag, last_modified):
+            self.status_code = 304
+            self.send_body = False
+        else:
+            headers["content-type"] = media_type
+            byte_range = None
+            range_header = request.headers.get('range')
+            if range_header and self._if_range_holds(request.headers.get('if-range'), etag, last_modified):
+                byte_range = _parse_range(range_header, size)
+
+            if byte_range is False:
+                self.status_code = 416
+                self.send_body = False
+                headers["content-range"] = f"bytes */{size}"
+                headers["content-length"] = "0"
+            elif byte_range:
+                start, end = byte_range
+                self.status_code = 206
+                self.range = (start, end - start + 1)
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+                headers["content-length"] = str(end - start + 1)
+            else:
+                self.range = (0, size)
+                headers["content-length"] = str(size)
+
+        self.init_headers(headers)
+
+    @staticmethod
+    def _not_modified(headers, etag: str, last_modified: datetime) -> bool:
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, etag)
+        since = _parse_date(headers.get('if-modified-since'))
+        return since is not None and int(last_modified.timestamp()) <= int(since.timestamp())
+
+    @staticmethod
+    def _if_range_holds(if_range, etag: str, last_modified: datetime) -> bool:
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith(('"', 'W/')):
+            # If-Range needs a strong match
+            return not etag.startswith('W/') and if_range == etag
+        date = _parse_date(if_range)
+        return date is not None and int(date.timestamp()) == int(last_modified.timestamp())
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or not self.range[1]:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        offset, count = self.range
+        path = self.storage.local_path(self.key)
+        extensions = scope.get("extensions") or {}
+        if path is not None and not self.codec:
+            if "http.response.zerocopysend" in extensions:
+                async with await anyio.open_file(path, "rb") as f:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": f.wrapped.fileno(),
+                        "offset": offset,
+                        "count": count,
+                    })
+                return
+            if "http.response.pathsend" in extensions and self.status_code == 200:
+                await send({"type": "http.response.pathsend", "path": str(path)})
+                return
+
+        await self._send_chunks(send, offset, count)
+
+    def _open(self, offset: int):
+        if not self.codec:
+            return self.storage.open(self.key, offset), None
+        # Compressed files are decoded from the start; seeking skips decoded output
+        raw = self.storage.open(self.key)
+        reader = decoding_reader(self.codec, raw)
+        if offset:
+            reader.seek(offset)
+        return reader, raw
+
+    async def _send_chunks(self, send, offset: int, count: int):
+        reader, raw = await anyio.to_thread.run_sync(self._open, offset)
+        try:
+            remaining = count
+            while remaining > 0:
+                data = await anyio.to_thread.run_sync(reader.read, min(self.chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                await send({"type": "http.response.body", "body": data, "more_body": remaining > 0})
+            if remaining > 0:
+                # Object shrank underneath us; close the body rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await anyio.to_thread.run_sync(reader.close)
+            if raw is not None:
+                await anyio.to_thread.run_sync(raw.close)
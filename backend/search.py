@@ -0,0 +1,67 @@
+import re
+
+# Characters of context kept around the first match in a snippet
+SNIPPET_LENGTH = 160
+
+# Crude suffix stripping so highlights roughly follow MongoDB's stemming
+# ("running" matches "run", "runs", ...)
+_SUFFIXES = ('ing', 'es', 'ed', 's')
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def parse_terms(query: str) -> list:
+    """Terms worth highlighting in ``query``, in MongoDB ``$text`` syntax.
+
+    Quoted phrases are kept whole, negated terms (``-word``) are dropped.
+    """
+    terms = []
+    for phrase in re.findall(r'"([^"]+)"', query):
+        terms.append(phrase.strip().lower())
+    for word in re.findall(r'(?:^|\s)([^\s"-][^\s"]*)', re.sub(r'"[^"]*"', ' ', query)):
+        terms += [_stem(w.lower()) for w in re.findall(r'\w+', word)]
+    return [t for t in dict.fromkeys(terms) if t]
+
+
+def _pattern(terms: list):
+    if not terms:
+        return None
+    alternatives = sorted((re.escape(t) for t in terms), key=len, reverse=True)
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + r')\w*', re.IGNORECASE)
+
+
+def highlight(text: str, terms: list) -> list:
+    """``[start, end]`` ranges of ``text`` matching any of ``terms``."""
+    pattern = _pattern(terms)
+    if not pattern or not text:
+        return []
+    return [[m.start(), m.end()] for m in pattern.finditer(text)]
+
+
+def snippet(text: str, terms: list, length: int = SNIPPET_LENGTH):
+    """Window of ``text`` around the first match, with highlight ranges
+    relative to the returned snippet. Falls back to the start of ``text``.
+    """
+    text = text or ''
+    ranges = highlight(text, terms)
+    start = 0
+    if ranges and ranges[0][1] > length:
+        start = max(0, ranges[0][0] - length // 4)
+        # Do not cut a word in half at the left edge
+        space = text.rfind(' ', 0, start)
+        start = space + 1 if space >= 0 and start - space < 20 else start
+    end = min(len(text), start + length)
+
+    fragment = text[start:end]
+    ranges = [[s - start, min(e, end) - start] for s, e in ranges if s >= start and s < end]
+    if start > 0:
+        fragment = '…' + fragment
+        ranges = [[s + 1, e + 1] for s, e in ranges]
+    if end < len(text):
+        fragment += '…'
+    return fragment, ranges
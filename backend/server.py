@@ -1,20 +1,43 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, UploadFile, File
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import RedirectResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
+import asyncio
+import functools
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import List, Literal, Optional, Tuple
 import uuid
-from datetime import datetime, timezone
-import bcrypt
+import base64
+import json
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
 import jwt
 import shutil
 import mimetypes
+from password_hasher import PasswordHasher, PasswordHasherBusy
+from token_cache import TokenCache
+from blob_store import BlobStore
+from storage import create_storage
+from storage_codec import CodecPolicy
+from indexes import SlowQueryLogger, ensure_indexes
+from metrics import CommandMetrics, MetricsMiddleware, MetricsRegistry, PoolMetrics
+from mongo_settings import MongoSettings
+from loop_monitor import LoopMonitor
+from tracing import CommandTracer, TraceLogFilter, Tracing, TracingMiddleware
+from usage import UsageCounters, file_category
+from search import highlight, parse_terms, snippet
+from ranged_file import RangedFileResponse
+from signed_urls import UrlSigner
+from thumbnails import THUMBNAIL_FORMAT, THUMBNAIL_MEDIA_TYPE, ThumbnailGenerator, thumbnail_name
+from streaming_upload import InvalidUpload, UploadTooLarge, assemble_parts, stream_body, stream_upload
+import anyio
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,19 +47,111 @@ mongo_url = os.environ.get('MONGO_URL') or os.environ.get('MONGODB_URI')
 if not mongo_url:
     raise Exception("MongoDB connection URL not found. Please set MONGO_URL or MONGODB_URI in .env")
 
-client = AsyncIOMotorClient(mongo_url)
+# Commands slower than SLOW_QUERY_MS are logged, flagging those without a usable index
+slow_query_logger = SlowQueryLogger(float(os.environ.get('SLOW_QUERY_MS', 100)))
+
+# Prometheus metrics, served at /metrics (behind METRICS_TOKEN when set)
+metrics = MetricsRegistry()
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Event loop lag watchdog: stalls over LOOP_BLOCK_THRESHOLD_MS are logged with the blocking stack (0 disables)
+loop_monitor = LoopMonitor(metrics, threshold=float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', 100)) / 1000)
+
+# Opt-in OpenTelemetry tracing: TRACING_EXPORTER=file (TRACING_FILE) or otlp
+tracing = Tracing(
+    os.environ.get('TRACING_EXPORTER'),
+    file_path=os.environ.get('TRACING_FILE', str(ROOT_DIR / 'traces.jsonl')),
+    service_name=os.environ.get('OTEL_SERVICE_NAME', 'ecoleaf-backend')
+)
+
+# Pool size, timeouts, wire compression and read routing from MONGO_* variables
+mongo_settings = MongoSettings.from_env()
+
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=[slow_query_logger, CommandMetrics(metrics), PoolMetrics(metrics), CommandTracer(tracing)],
+    **mongo_settings.client_options()
+)
 db = client['secureAuthDB']
+# Read-only list and stats endpoints may read from secondaries (MONGO_READ_PREFERENCE),
+# up to MONGO_MAX_STALENESS_SECONDS behind. They read through a read_session
+read_db = client.get_database('secureAuthDB', read_preference=mongo_settings.read_preference())
 
 # JWT Secret
 JWT_SECRET = os.environ.get('JWT_SECRET', 'secure-jwt-secret-key-production-change-this')
+token_cache = TokenCache(int(os.environ.get('TOKEN_CACHE_SIZE', 10000)))
+metrics.gauge("token_cache_entries", "Verified tokens held in the cache", function=lambda: token_cache.stats()['size'])
+metrics.counter("token_cache_hits_total", "Token checks answered from the cache", function=lambda: token_cache.hits)
+metrics.counter("token_cache_misses_total", "Token checks that had to verify the signature", function=lambda: token_cache.misses)
+
+# Signed direct-download URLs, valid for SIGNED_URL_TTL plus up to one SIGNED_URL_WINDOW
+url_signer = UrlSigner(
+    os.environ.get('SIGNED_URL_SECRET', JWT_SECRET),
+    ttl=int(os.environ.get('SIGNED_URL_TTL', 3600)),
+    window=int(os.environ.get('SIGNED_URL_WINDOW', 900))
+)
 
 # Create uploads directory
-UPLOAD_DIR = ROOT_DIR / 'uploads'
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR = Path(os.environ.get('UPLOAD_DIR') or ROOT_DIR / 'uploads')
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+INCOMING_DIR = UPLOAD_DIR / '.incoming'
+INCOMING_DIR.mkdir(exist_ok=True)
+
+# Where stored files live: STORAGE_BACKEND=local (UPLOAD_DIR, default) or s3.
+# Uploads are staged in INCOMING_DIR either way
+storage = create_storage(os.environ.get('STORAGE_BACKEND'), UPLOAD_DIR, INCOMING_DIR)
+
+# Content-addressed blob storage, shared by every file with the same SHA-256.
+# Unreferenced blobs are deleted once they have been unused for BLOB_GRACE_PERIOD seconds
+blob_store = BlobStore(db.blobs, storage, grace=int(os.environ.get('BLOB_GRACE_PERIOD', 3600)))
+BLOB_COLLECT_INTERVAL = 10 * 60  # 10 minutes
+
+# Optional compression at rest (STORAGE_CODEC=zstd) for compressible file types
+codec_policy = CodecPolicy(os.environ.get('STORAGE_CODEC'), level=int(os.environ.get('STORAGE_CODEC_LEVEL', 3)))
+
+# Per-user usage counters backing storage stats and analytics
+usage_counters = UsageCounters(db)
 
 # Blocked file extensions
 BLOCKED_EXTENSIONS = ['.exe', '.bat', '.sh', '.cmd', '.com', '.app', '.msi', '.dmg']
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))  # 1MB
+
+# Resumable uploads - larger files go through multi-part upload sessions
+MAX_RESUMABLE_FILE_SIZE = int(os.environ.get('MAX_RESUMABLE_FILE_SIZE', 5 * 1024 * 1024 * 1024))  # 5GB
+UPLOAD_PART_SIZE = int(os.environ.get('UPLOAD_PART_SIZE', 8 * 1024 * 1024))  # 8MB suggested to clients
+MAX_UPLOAD_PART_SIZE = int(os.environ.get('MAX_UPLOAD_PART_SIZE', 64 * 1024 * 1024))  # 64MB
+MAX_UPLOAD_PARTS = 10000
+UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 60 * 60))  # 24 hours
+UPLOAD_SESSION_CLEANUP_INTERVAL = 60 * 60  # 1 hour
+
+# List endpoints return pages of at most MAX_PAGE_SIZE items
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+PREVIEW_LENGTH = 160  # characters of content in summary list views
+
+# Password hashing pool - bcrypt runs off the event loop on its own threads
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', os.cpu_count() or 1))
+BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', 32))
+password_hasher = PasswordHasher(BCRYPT_WORKERS, BCRYPT_MAX_QUEUE)
+metrics.gauge("password_hasher_queue_depth", "bcrypt jobs waiting for a worker thread", function=lambda: password_hasher.queue_depth)
+metrics.gauge("password_hasher_in_flight", "bcrypt jobs queued or running", function=lambda: password_hasher.in_flight)
+password_hash_seconds = metrics.histogram("password_hash_seconds", "bcrypt queue wait and hash time", ["operation", "phase"])
+
+# Upload volume; rate(upload_bytes_total[1m]) is the ingest rate in bytes per second
+upload_bytes = metrics.counter("upload_bytes_total", "Bytes received by uploads", ["kind"])
+upload_throughput = metrics.histogram(
+    "upload_throughput_bytes_per_second",
+    "Per-request upload speed",
+    ["kind"],
+    buckets=(64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2)
+)
+
+# Image thumbnails are rendered in a pool of THUMBNAIL_WORKERS processes (0 disables them)
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+thumbnail_generator = ThumbnailGenerator(db.files, blob_store, INCOMING_DIR, THUMBNAIL_WORKERS, on_change=usage_counters.touch)
 
 # Create the main app
 app = FastAPI()
@@ -65,7 +180,7 @@ class RegisterResponse(BaseModel):
     message: str
     success: bool
 
-class FileResponse(BaseModel):
+class FileRecord(BaseModel):
     id: str = Field(alias='_id')
     userId: str
     fileName: str
@@ -93,6 +208,28 @@ class TextCreate(BaseModel):
     title: str = Field(min_length=1, max_length=200)
     content: str = Field(min_length=1)
 
+class UploadSessionCreate(BaseModel):
+    fileName: str = Field(min_length=1, max_length=255)
+    fileType: Optional[str] = None
+    fileSize: Optional[int] = Field(None, ge=0)
+
+class UploadSessionComplete(BaseModel):
+    parts: Optional[List[int]] = None
+
+# Bulk requests carry at most MAX_BULK_ITEMS items
+MAX_BULK_ITEMS = 500
+# Per-file deletes a bulk file delete keeps in flight, so it cannot drain the connection pool
+BULK_DELETE_CONCURRENCY = 8
+
+class NotesBulkCreate(BaseModel):
+    notes: List[NoteCreate] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+class TextsBulkCreate(BaseModel):
+    texts: List[TextCreate] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+class BulkDelete(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
 # Authentication helper
 async def verify_token(authorization: str = Header(None)):
     if not authorization or not authorization.startswith('Bearer '):
@@ -100,14 +237,160 @@ async def verify_token(authorization: str = Header(None)):
     
     token = authorization[7:]
     
+    # Tokens already verified are served from cache until they expire
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    
     try:
         decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        token_cache.put(token, decoded)
         return decoded
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# Pagination helpers
+def _encode_cursor(sort_value, doc_id) -> str:
+    raw = json.dumps([sort_value, doc_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, doc_id = json.loads(raw)
+        return sort_value, doc_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(
+    collection,
+    query: dict,
+    sort_field: str,
+    limit: int,
+    after: Optional[str],
+    projection: Optional[dict] = None,
+    session=None
+):
+    # Keyset pagination on (sort_field, _id), newest first
+    if after:
+        sort_value, last_id = _decode_cursor(after)
+        query = {
+            **query,
+            "$or": [
+                {sort_field: {"$lt": sort_value}},
+                {sort_field: sort_value, "_id": {"$lt": last_id}}
+            ]
+        }
+    
+    pipeline = [
+        {"$match": query},
+        {"$sort": {sort_field: -1, "_id": -1}},
+        {"$limit": limit + 1}
+    ]
+    if projection:
+        pipeline.append({"$project": projection})
+    docs = await collection.aggregate(pipeline, session=session).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = _encode_cursor(docs[-1][sort_field], docs[-1]['_id'])
+    return docs, next_cursor
+
+# Summary views fetch a preview snippet instead of the full content body;
+# the snippet and length are computed by MongoDB so content never leaves the server
+SUMMARY_PROJECTION = {
+    "title": 1,
+    "updatedAt": 1,
+    "preview": {"$substrCP": ["$content", 0, PREVIEW_LENGTH]},
+    "contentLength": {"$strLenCP": "$content"}
+}
+
+def _format_summary(doc: dict) -> dict:
+    return {
+        "_id": doc['_id'],
+        "title": doc['title'],
+        "updatedAt": doc['updatedAt'],
+        "preview": doc.get('preview', ''),
+        "contentLength": doc.get('contentLength', 0)
+    }
+
+# Conditional GET helpers
+# ETags are derived from the user's change version, which every mutation bumps,
+# so an unchanged poll costs one version lookup and no collection reads
+async def read_session():
+    # Reads routed to secondaries each select a server, so the version and the body
+    # can come from different members. In a causally consistent session the body
+    # read waits until its member has caught up with the version read before it,
+    # so the body is never older than its ETag. Primary reads need no session
+    if mongo_settings.read_preference_mode == 'primary':
+        yield None
+        return
+    async with await client.start_session(causal_consistency=True) as session:
+        yield session
+
+async def _not_modified(
+    request: Request,
+    response: Response,
+    user_id: str,
+    variant: str = '',
+    read_from=None,
+    session=None
+) -> Optional[Response]:
+    # variant covers inputs other than the user's data, e.g. the current date;
+    # read_from and session are what the response body will be read with
+    version = await usage_counters.version(user_id, read_from, session)
+    key = f"{user_id}:{request.url.path}?{sorted(request.query_params.multi_items())}:{variant}:{version}"
+    etag = f'W/"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if_none_match = request.headers.get('if-none-match', '')
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    if '*' in candidates or etag.removeprefix('W/') in candidates:
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return None
+
+# Password hashing helpers
+def _report_hash_timing(response: Response, operation: str, timing):
+    password_hash_seconds.observe(timing.wait_ms / 1000, operation=operation, phase="wait")
+    password_hash_seconds.observe(timing.hash_ms / 1000, operation=operation, phase="hash")
+    response.headers['Server-Timing'] = (
+        f"bcrypt-wait;dur={timing.wait_ms:.1f}, bcrypt-{operation};dur={timing.hash_ms:.1f}"
+    )
+    logging.info(
+        f"bcrypt {operation}: wait={timing.wait_ms:.1f}ms hash={timing.hash_ms:.1f}ms "
+        f"queue={password_hasher.queue_depth}"
+    )
+
+def _hasher_busy():
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy. Please try again shortly.",
+        headers={"Retry-After": "1"}
+    )
+
+async def hash_password(password: str, response: Response) -> str:
+    try:
+        with tracing.span("bcrypt.hash"):
+            password_hash, timing = await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    _report_hash_timing(response, "hash", timing)
+    return password_hash
+
+async def check_password(password: str, password_hash: str, response: Response) -> bool:
+    try:
+        with tracing.span("bcrypt.verify"):
+            matches, timing = await password_hasher.verify(password, password_hash)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    _report_hash_timing(response, "verify", timing)
+    return matches
+
 # Routes
 @api_router.get("/")
 async def root():
@@ -115,29 +398,33 @@ async def root():
 
 # Auth Routes
 @api_router.post("/auth/register")
-async def register(user_data: UserRegister):
+async def register(user_data: UserRegister, response: Response):
     try:
-        # Check if user already exists
-        existing_user = await db.users.find_one({"email": user_data.email.lower()})
-        if existing_user:
+        email = user_data.email.lower()
+        
+        # Cheap lookup first, so duplicate or replayed registrations never queue for bcrypt
+        if await db.users.find_one({"email": email}, {"_id": 1}):
             raise HTTPException(status_code=400, detail="User already registered. Please login.")
         
         # Hash password
-        salt = bcrypt.gensalt()
-        password_hash = bcrypt.hashpw(user_data.password.encode(), salt).decode()
+        password_hash = await hash_password(user_data.password, response)
         
         # Create user
         user_id = str(uuid.uuid4())
         user_doc = {
             "_id": user_id,
-            "email": user_data.email.lower(),
+            "email": email,
             "passwordHash": password_hash,
             "authProvider": "email",
             "createdAt": datetime.now(timezone.utc).isoformat(),
             "lastLogin": datetime.now(timezone.utc).isoformat()
         }
         
-        await db.users.insert_one(user_doc)
+        # The unique email index rejects a duplicate registered concurrently
+        try:
+            await db.users.insert_one(user_doc)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="User already registered. Please login.")
         
         return {"message": "Registration successful", "success": True}
     except HTTPException:
@@ -147,7 +434,7 @@ async def register(user_data: UserRegister):
         raise HTTPException(status_code=500, detail="Registration failed")
 
 @api_router.post("/auth/login")
-async def login(user_data: UserLogin):
+async def login(user_data: UserLogin, response: Response):
     try:
         # Find user
         user = await db.users.find_one({"email": user_data.email.lower()})
@@ -155,7 +442,7 @@ async def login(user_data: UserLogin):
             raise HTTPException(status_code=404, detail="User not registered. Please register first.")
         
         # Verify password
-        if not bcrypt.checkpw(user_data.password.encode(), user['passwordHash'].encode()):
+        if not await check_password(user_data.password, user['passwordHash'], response):
             raise HTTPException(status_code=401, detail="Incorrect password.")
         
         # Update last login
@@ -209,8 +496,12 @@ async def phone_login(data: PhoneLogin):
                 "createdAt": datetime.now(timezone.utc).isoformat(),
                 "lastLogin": datetime.now(timezone.utc).isoformat()
             }
-            await db.users.insert_one(user_doc)
-            user = user_doc
+            try:
+                await db.users.insert_one(user_doc)
+                user = user_doc
+            except DuplicateKeyError:
+                # A concurrent first login with this number created the user
+                user = await db.users.find_one({"phoneNumber": data.phoneNumber})
         else:
             # Update last login
             await db.users.update_one(
@@ -245,70 +536,430 @@ async def phone_login(data: PhoneLogin):
         raise HTTPException(status_code=500, detail="Phone authentication failed")
 
 # File Routes
-@api_router.post("/files/upload")
-async def upload_file(file: UploadFile = File(...), user: dict = Depends(verify_token)):
-    try:
-        if not file:
-            raise HTTPException(status_code=400, detail="No file uploaded")
-        
-        # Check file extension
-        ext = Path(file.filename).suffix.lower()
-        if ext in BLOCKED_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="Executable files are not allowed for security reasons")
-        
-        # Generate unique filename
-        unique_suffix = f"{int(datetime.now().timestamp() * 1000)}-{uuid.uuid4().hex[:8]}"
-        new_filename = f"file-{unique_suffix}{ext}"
-        file_path = UPLOAD_DIR / new_filename
-        
-        # Save file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
-            buffer.write(content)
-        
-        # Get file type
-        file_type = file.content_type or mimetypes.guess_type(file.filename)[0] or 'application/octet-stream'
-        
-        # Save file metadata
-        file_id = str(uuid.uuid4())
-        file_url = f"/uploads/{new_filename}"
-        file_doc = {
-            "_id": file_id,
+def _check_upload_filename(filename: str):
+    ext = Path(filename).suffix.lower()
+    if ext in BLOCKED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Executable files are not allowed for security reasons")
+
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+async def _save_uploaded_file(
+    user_id: str,
+    incoming_path: Path,
+    original_name: str,
+    content_type: Optional[str],
+    size: int,
+    sha256: str,
+    codec: Optional[str] = None,
+    stored_size: Optional[int] = None,
+    file_id: Optional[str] = None
+) -> dict:
+    # Move the completed upload into the blob store; repeated content is only referenced
+    try:
+        with tracing.span("blob_store.add", **{"file.size": size}):
+            blob = await blob_store.add(incoming_path, sha256, size, codec=codec, stored_size=stored_size)
+    except Exception:
+        await anyio.to_thread.run_sync(lambda: incoming_path.unlink(missing_ok=True))
+        raise
+    new_filename = blob_store.key(sha256)
+    
+    # Get file type
+    file_type = content_type or mimetypes.guess_type(original_name)[0] or 'application/octet-stream'
+    
+    # Save file metadata
+    file_doc = {
+        "_id": file_id or str(uuid.uuid4()),
+        "userId": user_id,
+        "fileName": new_filename,
+        "originalName": original_name,
+        "fileType": file_type,
+        "category": file_category(file_type),
+        "fileSize": size,
+        "codec": blob.codec,
+        "storedSize": blob.stored_size,
+        "sha256": sha256,
+        "blobHash": sha256,
+        "uploadedAt": datetime.now(timezone.utc).isoformat()
+    }
+    if thumbnail_generator.wants(file_type):
+        file_doc["thumbnails"] = {"status": "pending"}
+    
+    try:
+        await db.files.insert_one(file_doc)
+    except Exception:
+        # Nothing points at the blob reference just taken
+        await blob_store.release(sha256)
+        raise
+    await usage_counters.files_added(user_id, file_doc)
+    
+    # Thumbnails are rendered in the background; the upload response does not wait
+    if "thumbnails" in file_doc:
+        thumbnail_generator.enqueue(file_doc)
+    return file_doc
+
+def _file_url(file_doc: dict) -> str:
+    return f"/api/files/download/{file_doc['_id']}"
+
+def _signed_url(file_doc: dict) -> str:
+    token, _ = url_signer.sign(file_doc)
+    return f"/api/files/signed/{token}"
+
+def _thumbnail_doc(file_doc: dict, size: str) -> dict:
+    # A thumbnail described like a stored file, for signing and serving
+    digest = file_doc['blobHash']
+    stem = Path(file_doc['originalName']).stem
+    return {
+        "fileName": blob_store.derivative_key(digest, thumbnail_name(size)),
+        "userId": file_doc['userId'],
+        "originalName": f"{stem}-{size}.{THUMBNAIL_FORMAT}",
+        "fileType": THUMBNAIL_MEDIA_TYPE,
+        "sha256": f"{digest}-{size}"
+    }
+
+def _thumbnail_url(file_doc: dict, size: str = 'medium') -> Optional[str]:
+    if file_doc.get('thumbnails', {}).get('status') != 'ready':
+        return None
+    return _signed_url(_thumbnail_doc(file_doc, size))
+
+def _uploaded_file_response(file_doc: dict) -> dict:
+    return {
+        "message": "File uploaded successfully",
+        "file": {
+            "id": file_doc['_id'],
+            "fileName": file_doc['originalName'],
+            "fileType": file_doc['fileType'],
+            "fileSize": file_doc['fileSize'],
+            "fileUrl": _file_url(file_doc),
+            "signedUrl": _signed_url(file_doc),
+            "thumbnailUrl": _thumbnail_url(file_doc),
+            "uploadedAt": file_doc['uploadedAt']
+        }
+    }
+
+def _record_upload(kind: str, size: int, elapsed: float):
+    upload_bytes.inc(size, kind=kind)
+    if elapsed > 0:
+        upload_throughput.observe(size / elapsed, kind=kind)
+
+@api_router.post("/files/upload", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_file(request: Request, user: dict = Depends(verify_token)):
+    incoming_path = INCOMING_DIR / uuid.uuid4().hex
+    try:
+        # Stream the file part to disk; the size limit is enforced as bytes arrive
+        started = time.perf_counter()
+        try:
+            with tracing.span("upload.write") as span:
+                upload = await stream_upload(
+                    request,
+                    incoming_path,
+                    max_size=MAX_FILE_SIZE,
+                    chunk_size=UPLOAD_CHUNK_SIZE,
+                    check_filename=_check_upload_filename,
+                    codec_policy=codec_policy
+                )
+                span.set_attribute("file.size", upload.size)
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail="File size exceeds 50MB limit")
+        except InvalidUpload as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        _record_upload("file", upload.size, time.perf_counter() - started)
+        
+        file_doc = await _save_uploaded_file(
+            user['userId'], incoming_path, upload.filename, upload.content_type, upload.size, upload.sha256,
+            upload.codec, upload.stored_size
+        )
+        return _uploaded_file_response(file_doc)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"File upload error: {e}")
+        raise HTTPException(status_code=500, detail="File upload failed")
+
+# Resumable Upload Routes
+def _session_part_key(upload_id: str, part_number: int) -> str:
+    # Unique per attempt, so a retried part never overwrites bytes being assembled
+    return f".parts/{upload_id}/{part_number:05d}-{uuid.uuid4().hex}.part"
+
+def _recorded_part_key(upload_id: str, part_number: int, part: dict) -> str:
+    # Parts recorded before keys were stored used one fixed key per part number
+    return part.get('key') or f".parts/{upload_id}/{part_number:05d}.part"
+
+async def _remove_session_parts(upload_id: str):
+    await storage.delete_prefix(f".parts/{upload_id}/")
+
+def _format_upload_session(session: dict) -> dict:
+    parts = session.get('parts', {})
+    return {
+        "uploadId": session['_id'],
+        "fileName": session['originalName'],
+        "fileType": session.get('fileType'),
+        "fileSize": session.get('fileSize'),
+        "partSize": session['partSize'],
+        "status": session['status'],
+        "parts": [
+            {"partNumber": int(n), "size": p['size'], "sha256": p['sha256']}
+            for n, p in sorted(parts.items(), key=lambda item: int(item[0]))
+        ],
+        "createdAt": session['createdAt'],
+        "expiresAt": session['expiresAt']
+    }
+
+@api_router.post("/files/uploads")
+async def create_upload_session(session_data: UploadSessionCreate, user: dict = Depends(verify_token)):
+    try:
+        _check_upload_filename(session_data.fileName)
+        if session_data.fileSize is not None and session_data.fileSize > MAX_RESUMABLE_FILE_SIZE:
+            raise HTTPException(status_code=413, detail="File size exceeds the upload limit")
+        
+        now = datetime.now(timezone.utc)
+        session_doc = {
+            "_id": uuid.uuid4().hex,
             "userId": user['userId'],
-            "fileName": new_filename,
-            "originalName": file.filename,
-            "fileType": file_type,
-            "fileSize": len(content),
-            "fileUrl": file_url,
-            "uploadedAt": datetime.now(timezone.utc).isoformat()
+            "originalName": session_data.fileName,
+            "fileType": session_data.fileType,
+            "fileSize": session_data.fileSize,
+            "partSize": UPLOAD_PART_SIZE,
+            "parts": {},
+            "status": "active",
+            "createdAt": now.isoformat(),
+            "expiresAt": (now + timedelta(seconds=UPLOAD_SESSION_TTL)).isoformat()
         }
         
-        await db.files.insert_one(file_doc)
+        await db.upload_sessions.insert_one(session_doc)
         
         return {
-            "message": "File uploaded successfully",
-            "file": {
-                "id": file_id,
-                "fileName": file.filename,
-                "fileType": file_type,
-                "fileSize": len(content),
-                "fileUrl": file_url,
-                "uploadedAt": file_doc['uploadedAt']
+            "message": "Upload session created",
+            "upload": {
+                **_format_upload_session(session_doc),
+                "maxPartSize": MAX_UPLOAD_PART_SIZE,
+                "maxParts": MAX_UPLOAD_PARTS
             }
         }
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"File upload error: {e}")
-        raise HTTPException(status_code=500, detail="File upload failed")
+        logging.error(f"Create upload session error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create upload session")
+
+@api_router.get("/files/uploads/{upload_id}")
+async def get_upload_session(upload_id: str, user: dict = Depends(verify_token)):
+    try:
+        session = await db.upload_sessions.find_one({"_id": upload_id, "userId": user['userId']})
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        
+        return {"upload": _format_upload_session(session)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Get upload session error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch upload session")
+
+@api_router.put(
+    "/files/uploads/{upload_id}/parts/{part_number}",
+    openapi_extra={"requestBody": {"required": True, "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}}}
+)
+async def upload_part(upload_id: str, part_number: int, request: Request, user: dict = Depends(verify_token)):
+    try:
+        if not 1 <= part_number <= MAX_UPLOAD_PARTS:
+            raise HTTPException(status_code=400, detail=f"Part number must be between 1 and {MAX_UPLOAD_PARTS}")
+        
+        session = await db.upload_sessions.find_one(
+            {"_id": upload_id, "userId": user['userId']},
+            {"status": 1}
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        if session['status'] != "active":
+            raise HTTPException(status_code=409, detail="Upload session is no longer accepting parts")
+        
+        # Stage the part locally, then store it whole under a key of its own
+        incoming_path = INCOMING_DIR / uuid.uuid4().hex
+        started = time.perf_counter()
+        try:
+            with tracing.span("upload.write") as span:
+                size, sha256 = await stream_body(request, incoming_path, MAX_UPLOAD_PART_SIZE, UPLOAD_CHUNK_SIZE)
+                span.set_attribute("file.size", size)
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail="Upload part exceeds the part size limit")
+        _record_upload("part", size, time.perf_counter() - started)
+        part_key = _session_part_key(upload_id, part_number)
+        with tracing.span("storage.put"):
+            await storage.put(part_key, incoming_path)
+        
+        # Recording the key is what makes the part count; the object it replaces is dropped
+        previous = await db.upload_sessions.find_one_and_update(
+            {"_id": upload_id, "userId": user['userId'], "status": "active"},
+            {"$set": {f"parts.{part_number}": {
+                "size": size,
+                "sha256": sha256,
+                "key": part_key,
+                "uploadedAt": datetime.now(timezone.utc).isoformat()
+            }}},
+            projection={f"parts.{part_number}": 1}
+        )
+        if previous is None:
+            await storage.delete(part_key)
+            raise HTTPException(status_code=409, detail="Upload session is no longer accepting parts")
+        replaced = previous.get('parts', {}).get(str(part_number))
+        if replaced:
+            await storage.delete(_recorded_part_key(upload_id, part_number, replaced))
+        
+        return {"partNumber": part_number, "size": size, "sha256": sha256}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Upload part error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to upload part")
+
+async def _reopen_upload_session(upload_id: str, file_id: str):
+    # Let the client retry a failed complete, unless the file was recorded before the
+    # failure; that session is finished and only its cleanup is left
+    if await db.files.find_one({"_id": file_id}, {"_id": 1}):
+        return
+    await db.upload_sessions.update_one({"_id": upload_id}, {"$set": {"status": "active"}})
+
+@api_router.post("/files/uploads/{upload_id}/complete")
+async def complete_upload_session(upload_id: str, complete_data: UploadSessionComplete, user: dict = Depends(verify_token)):
+    session = None
+    file_id = str(uuid.uuid4())
+    try:
+        # Claim the session so concurrent completes or new parts cannot race the assembly
+        session = await db.upload_sessions.find_one_and_update(
+            {"_id": upload_id, "userId": user['userId'], "status": "active"},
+            {"$set": {"status": "completing"}}
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found or already completed")
+        
+        uploaded = {int(n): p for n, p in session.get('parts', {}).items()}
+        part_numbers = complete_data.parts or sorted(uploaded)
+        if not part_numbers or part_numbers != list(range(1, len(part_numbers) + 1)):
+            raise HTTPException(status_code=400, detail="Parts must be numbered consecutively from 1")
+        missing = [n for n in part_numbers if n not in uploaded]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing parts: {missing}")
+        
+        expected_size = sum(uploaded[n]['size'] for n in part_numbers)
+        if expected_size > MAX_RESUMABLE_FILE_SIZE:
+            raise HTTPException(status_code=413, detail="File size exceeds the upload limit")
+        if session.get('fileSize') is not None and expected_size != session['fileSize']:
+            raise HTTPException(status_code=400, detail="Uploaded parts do not match the declared file size")
+        
+        # Concatenate the parts chunk by chunk in a worker thread
+        incoming_path = INCOMING_DIR / uuid.uuid4().hex
+        with tracing.span("upload.assemble", **{"upload.parts": len(part_numbers)}):
+            size, sha256, codec, stored_size = await anyio.to_thread.run_sync(
+                assemble_parts,
+                [functools.partial(storage.open, _recorded_part_key(upload_id, n, uploaded[n])) for n in part_numbers],
+                incoming_path,
+                UPLOAD_CHUNK_SIZE,
+                codec_policy,
+                session.get('fileType') or mimetypes.guess_type(session['originalName'])[0]
+            )
+        if size != expected_size:
+            await anyio.to_thread.run_sync(lambda: incoming_path.unlink(missing_ok=True))
+            logging.error(f"Upload {upload_id} assembled {size} bytes, parts record {expected_size}")
+            raise HTTPException(status_code=409, detail="Uploaded parts changed while completing. Please retry")
+        
+        file_doc = await _save_uploaded_file(
+            user['userId'], incoming_path, session['originalName'], session.get('fileType'), size, sha256,
+            codec, stored_size, file_id=file_id
+        )
+        
+        # The file is recorded: from here a failure must not reopen the session, or a
+        # retried complete would record it twice. Leftovers expire with the session
+        try:
+            await db.upload_sessions.delete_one({"_id": upload_id})
+            await _remove_session_parts(upload_id)
+        except Exception as e:
+            logging.error(f"Upload session cleanup error for {upload_id}: {e}")
+        
+        return _uploaded_file_response(file_doc)
+    except HTTPException:
+        if session:
+            await _reopen_upload_session(upload_id, file_id)
+        raise
+    except Exception as e:
+        logging.error(f"Complete upload error: {e}")
+        if session:
+            await _reopen_upload_session(upload_id, file_id)
+        raise HTTPException(status_code=500, detail="Failed to complete upload")
+
+@api_router.delete("/files/uploads/{upload_id}")
+async def abort_upload_session(upload_id: str, user: dict = Depends(verify_token)):
+    try:
+        session = await db.upload_sessions.find_one_and_delete(
+            {"_id": upload_id, "userId": user['userId'], "status": "active"}
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        
+        await _remove_session_parts(upload_id)
+        
+        return {"message": "Upload aborted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Abort upload error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to abort upload")
+
+async def purge_expired_upload_sessions():
+    now = datetime.now(timezone.utc).isoformat()
+    expired = await db.upload_sessions.find({"expiresAt": {"$lt": now}}, {"_id": 1}).to_list(None)
+    for session in expired:
+        await db.upload_sessions.delete_one({"_id": session['_id']})
+        await _remove_session_parts(session['_id'])
+    if expired:
+        logging.info(f"Purged {len(expired)} expired upload sessions")
+
+async def _upload_session_janitor():
+    while True:
+        try:
+            await purge_expired_upload_sessions()
+        except Exception as e:
+            logging.error(f"Upload session cleanup error: {e}")
+        await asyncio.sleep(UPLOAD_SESSION_CLEANUP_INTERVAL)
+
+async def _blob_janitor():
+    while True:
+        try:
+            collected = await blob_store.collect()
+            if collected:
+                logging.info(f"Deleted {collected} unreferenced blobs")
+        except Exception as e:
+            logging.error(f"Blob cleanup error: {e}")
+        await asyncio.sleep(BLOB_COLLECT_INTERVAL)
 
 @api_router.get("/files")
-async def get_files(user: dict = Depends(verify_token)):
+async def get_files(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    user: dict = Depends(verify_token),
+    session=Depends(read_session)
+):
     try:
-        files_cursor = db.files.find({"userId": user['userId']}).sort("uploadedAt", -1)
-        files = await files_cursor.to_list(1000)
+        # Signed URLs in the body roll over with each signing window
+        not_modified = await _not_modified(request, response, user['userId'], str(url_signer.current_window()), read_from=read_db, session=session)
+        if not_modified:
+            return not_modified
+        
+        files, next_cursor = await paginate(read_db.files, {"userId": user['userId']}, "uploadedAt", limit, after, session=session)
         
         # Format files for response
         formatted_files = []
@@ -320,30 +971,74 @@ async def get_files(user: dict = Depends(verify_token)):
                 "originalName": f['originalName'],
                 "fileType": f['fileType'],
                 "fileSize": f['fileSize'],
-                "fileUrl": f['fileUrl'],
+                "fileUrl": _file_url(f),
+                "signedUrl": _signed_url(f),
+                "thumbnailUrl": _thumbnail_url(f),
                 "uploadedAt": f['uploadedAt']
             })
         
-        return {"files": formatted_files}
+        return {"files": formatted_files, "nextCursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Fetch files error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch files")
 
+async def _claim_deletions(collection, user_id: str, ids: List[str]) -> list:
+    # Resolve the user's documents in one read, then delete each atomically and return
+    # those this call removed. A document deleted by a concurrent request is not
+    # returned, so its counters and storage are only ever released once
+    owned = await collection.find({"_id": {"$in": ids}, "userId": user_id}, {"_id": 1}).to_list(len(ids))
+    claim_slots = asyncio.Semaphore(BULK_DELETE_CONCURRENCY)
+
+    async def claim(item_id: str):
+        async with claim_slots:
+            return await collection.find_one_and_delete({"_id": item_id, "userId": user_id})
+
+    docs = await asyncio.gather(*(claim(d['_id']) for d in owned))
+    return [d for d in docs if d]
+
+async def _remove_stored_file(file_doc: dict):
+    if file_doc.get('blobHash'):
+        await blob_store.release(file_doc['blobHash'])
+        return
+    await storage.delete(file_doc['fileName'])
+
+@api_router.delete("/files/bulk")
+async def delete_files_bulk(delete_data: BulkDelete, user: dict = Depends(verify_token)):
+    try:
+        ids = list(dict.fromkeys(delete_data.ids))
+        file_docs = await _claim_deletions(db.files, user['userId'], ids)
+        
+        # Only files this request removed: one deleted concurrently elsewhere is released there
+        if file_docs:
+            await usage_counters.files_removed(user['userId'], *file_docs)
+            
+            # Release blobs concurrently; the unlinks themselves run in worker threads
+            outcomes = await asyncio.gather(*(_remove_stored_file(f) for f in file_docs), return_exceptions=True)
+            for file_doc, outcome in zip(file_docs, outcomes):
+                if isinstance(outcome, Exception):
+                    logging.error(f"Bulk delete storage cleanup error for {file_doc['_id']}: {outcome}")
+        
+        return _bulk_delete_response(ids, {f['_id'] for f in file_docs}, len(file_docs))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Bulk delete files error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to delete files")
+
 @api_router.delete("/files/{file_id}")
 async def delete_file(file_id: str, user: dict = Depends(verify_token)):
     try:
-        # Find file
-        file_doc = await db.files.find_one({"_id": file_id, "userId": user['userId']})
+        # Delete from database, returning the document for storage cleanup
+        file_doc = await db.files.find_one_and_delete({"_id": file_id, "userId": user['userId']})
         if not file_doc:
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Delete physical file
-        file_path = UPLOAD_DIR / file_doc['fileName']
-        if file_path.exists():
-            file_path.unlink()
+        await usage_counters.files_removed(user['userId'], file_doc)
         
-        # Delete from database
-        await db.files.delete_one({"_id": file_id})
+        # Drop the blob reference (or the legacy per-upload file)
+        await _remove_stored_file(file_doc)
         
         return {"message": "File deleted successfully"}
     except HTTPException:
@@ -354,8 +1049,12 @@ async def delete_file(file_id: str, user: dict = Depends(verify_token)):
 
 # User Profile Routes
 @api_router.get("/user/profile")
-async def get_profile(user: dict = Depends(verify_token)):
+async def get_profile(request: Request, response: Response, user: dict = Depends(verify_token)):
     try:
+        not_modified = await _not_modified(request, response, user['userId'])
+        if not_modified:
+            return not_modified
+        
         user_doc = await db.users.find_one({"_id": user['userId']})
         if not user_doc:
             raise HTTPException(status_code=404, detail="User not found")
@@ -389,6 +1088,7 @@ async def update_profile(user_update: UserUpdate, user: dict = Depends(verify_to
             {"_id": user['userId']},
             {"$set": update_data}
         )
+        await usage_counters.touch(user['userId'])
         
         return {"message": "Profile updated successfully", "success": True}
     except HTTPException:
@@ -397,6 +1097,52 @@ async def update_profile(user_update: UserUpdate, user: dict = Depends(verify_to
         logging.error(f"Update profile error: {e}")
         raise HTTPException(status_code=500, detail="Profile update failed")
 
+# Bulk helpers shared by notes and texts
+async def _bulk_create(collection, user_id: str, items) -> list:
+    now = datetime.now(timezone.utc).isoformat()
+    docs = [
+        {
+            "_id": str(uuid.uuid4()),
+            "userId": user_id,
+            "title": item.title,
+            "content": item.content,
+            "createdAt": now,
+            "updatedAt": now
+        }
+        for item in items
+    ]
+    
+    failed = {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {err['index']: err.get('errmsg', 'Insert failed') for err in e.details.get('writeErrors', [])}
+    
+    return [
+        {"index": i, "id": doc['_id'], "status": "created", "createdAt": now, "updatedAt": now}
+        if i not in failed else
+        {"index": i, "status": "failed", "error": failed[i]}
+        for i, doc in enumerate(docs)
+    ]
+
+async def _bulk_delete(collection, user_id: str, ids: List[str]) -> Tuple[set, int]:
+    # Resolve which ids the user owns, then remove them in one delete_many
+    owned = await collection.find({"_id": {"$in": ids}, "userId": user_id}, {"_id": 1}).to_list(len(ids))
+    owned_ids = {d['_id'] for d in owned}
+    if not owned_ids:
+        return owned_ids, 0
+    result = await collection.delete_many({"_id": {"$in": list(owned_ids)}, "userId": user_id})
+    return owned_ids, result.deleted_count
+
+def _bulk_delete_response(ids: List[str], deleted_ids: set, deleted: int) -> dict:
+    return {
+        "deleted": deleted,
+        "results": [
+            {"id": item_id, "status": "deleted" if item_id in deleted_ids else "not_found"}
+            for item_id in ids
+        ]
+    }
+
 # Notes Routes
 @api_router.post("/notes")
 async def create_note(note_data: NoteCreate, user: dict = Depends(verify_token)):
@@ -412,6 +1158,7 @@ async def create_note(note_data: NoteCreate, user: dict = Depends(verify_token))
         }
         
         await db.notes.insert_one(note_doc)
+        await usage_counters.notes_changed(user['userId'], 1)
         
         return {
             "message": "Note created successfully",
@@ -430,10 +1177,27 @@ async def create_note(note_data: NoteCreate, user: dict = Depends(verify_token))
         raise HTTPException(status_code=500, detail="Failed to create note")
 
 @api_router.get("/notes")
-async def get_notes(user: dict = Depends(verify_token)):
+async def get_notes(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    view: Literal['full', 'summary'] = 'full',
+    user: dict = Depends(verify_token),
+    session=Depends(read_session)
+):
     try:
-        notes_cursor = db.notes.find({"userId": user['userId']}).sort("updatedAt", -1)
-        notes = await notes_cursor.to_list(1000)
+        not_modified = await _not_modified(request, response, user['userId'], read_from=read_db, session=session)
+        if not_modified:
+            return not_modified
+        
+        projection = SUMMARY_PROJECTION if view == 'summary' else None
+        notes, next_cursor = await paginate(
+            read_db.notes, {"userId": user['userId']}, "updatedAt", limit, after, projection, session
+        )
+        
+        if view == 'summary':
+            return {"notes": [_format_summary(n) for n in notes], "nextCursor": next_cursor}
         
         formatted_notes = []
         for n in notes:
@@ -446,7 +1210,9 @@ async def get_notes(user: dict = Depends(verify_token)):
                 "updatedAt": n['updatedAt']
             })
         
-        return {"notes": formatted_notes}
+        return {"notes": formatted_notes, "nextCursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Fetch notes error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch notes")
@@ -477,36 +1243,75 @@ async def get_note(note_id: str, user: dict = Depends(verify_token)):
 @api_router.put("/notes/{note_id}")
 async def update_note(note_id: str, note_data: NoteUpdate, user: dict = Depends(verify_token)):
     try:
-        note = await db.notes.find_one({"_id": note_id, "userId": user['userId']})
-        if not note:
-            raise HTTPException(status_code=404, detail="Note not found")
-        
         update_data = {"updatedAt": datetime.now(timezone.utc).isoformat()}
         if note_data.title is not None:
             update_data['title'] = note_data.title
         if note_data.content is not None:
             update_data['content'] = note_data.content
         
-        await db.notes.update_one(
-            {"_id": note_id},
-            {"$set": update_data}
+        # Ownership check and update in one round trip
+        note = await db.notes.find_one_and_update(
+            {"_id": note_id, "userId": user['userId']},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
+        if not note:
+            raise HTTPException(status_code=404, detail="Note not found")
+        await usage_counters.touch(user['userId'])
         
-        return {"message": "Note updated successfully"}
+        return {
+            "message": "Note updated successfully",
+            "note": {
+                "_id": note['_id'],
+                "userId": note['userId'],
+                "title": note['title'],
+                "content": note['content'],
+                "createdAt": note['createdAt'],
+                "updatedAt": note['updatedAt']
+            }
+        }
     except HTTPException:
         raise
     except Exception as e:
         logging.error(f"Update note error: {e}")
         raise HTTPException(status_code=500, detail="Failed to update note")
 
+@api_router.post("/notes/bulk")
+async def create_notes_bulk(bulk_data: NotesBulkCreate, user: dict = Depends(verify_token)):
+    try:
+        results = await _bulk_create(db.notes, user['userId'], bulk_data.notes)
+        created = sum(1 for r in results if r['status'] == "created")
+        await usage_counters.notes_changed(user['userId'], created)
+        
+        return {"created": created, "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Bulk create notes error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create notes")
+
+@api_router.delete("/notes/bulk")
+async def delete_notes_bulk(delete_data: BulkDelete, user: dict = Depends(verify_token)):
+    try:
+        ids = list(dict.fromkeys(delete_data.ids))
+        deleted_ids, deleted = await _bulk_delete(db.notes, user['userId'], ids)
+        await usage_counters.notes_changed(user['userId'], -deleted)
+        
+        return _bulk_delete_response(ids, deleted_ids, deleted)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Bulk delete notes error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to delete notes")
+
 @api_router.delete("/notes/{note_id}")
 async def delete_note(note_id: str, user: dict = Depends(verify_token)):
     try:
-        note = await db.notes.find_one({"_id": note_id, "userId": user['userId']})
-        if not note:
+        result = await db.notes.delete_one({"_id": note_id, "userId": user['userId']})
+        if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Note not found")
         
-        await db.notes.delete_one({"_id": note_id})
+        await usage_counters.notes_changed(user['userId'], -1)
         
         return {"message": "Note deleted successfully"}
     except HTTPException:
@@ -530,6 +1335,7 @@ async def create_text(text_data: TextCreate, user: dict = Depends(verify_token))
         }
         
         await db.texts.insert_one(text_doc)
+        await usage_counters.texts_changed(user['userId'], 1)
         
         return {
             "message": "Text saved successfully",
@@ -548,10 +1354,27 @@ async def create_text(text_data: TextCreate, user: dict = Depends(verify_token))
         raise HTTPException(status_code=500, detail="Failed to save text")
 
 @api_router.get("/texts")
-async def get_texts(user: dict = Depends(verify_token)):
+async def get_texts(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    view: Literal['full', 'summary'] = 'full',
+    user: dict = Depends(verify_token),
+    session=Depends(read_session)
+):
     try:
-        texts_cursor = db.texts.find({"userId": user['userId']}).sort("updatedAt", -1)
-        texts = await texts_cursor.to_list(1000)
+        not_modified = await _not_modified(request, response, user['userId'], read_from=read_db, session=session)
+        if not_modified:
+            return not_modified
+        
+        projection = SUMMARY_PROJECTION if view == 'summary' else None
+        texts, next_cursor = await paginate(
+            read_db.texts, {"userId": user['userId']}, "updatedAt", limit, after, projection, session
+        )
+        
+        if view == 'summary':
+            return {"texts": [_format_summary(t) for t in texts], "nextCursor": next_cursor}
         
         formatted_texts = []
         for t in texts:
@@ -564,19 +1387,49 @@ async def get_texts(user: dict = Depends(verify_token)):
                 "updatedAt": t['updatedAt']
             })
         
-        return {"texts": formatted_texts}
+        return {"texts": formatted_texts, "nextCursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Fetch texts error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch texts")
 
+@api_router.post("/texts/bulk")
+async def create_texts_bulk(bulk_data: TextsBulkCreate, user: dict = Depends(verify_token)):
+    try:
+        results = await _bulk_create(db.texts, user['userId'], bulk_data.texts)
+        created = sum(1 for r in results if r['status'] == "created")
+        await usage_counters.texts_changed(user['userId'], created)
+        
+        return {"created": created, "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Bulk create texts error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create texts")
+
+@api_router.delete("/texts/bulk")
+async def delete_texts_bulk(delete_data: BulkDelete, user: dict = Depends(verify_token)):
+    try:
+        ids = list(dict.fromkeys(delete_data.ids))
+        deleted_ids, deleted = await _bulk_delete(db.texts, user['userId'], ids)
+        await usage_counters.texts_changed(user['userId'], -deleted)
+        
+        return _bulk_delete_response(ids, deleted_ids, deleted)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Bulk delete texts error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to delete texts")
+
 @api_router.delete("/texts/{text_id}")
 async def delete_text(text_id: str, user: dict = Depends(verify_token)):
     try:
-        text = await db.texts.find_one({"_id": text_id, "userId": user['userId']})
-        if not text:
+        result = await db.texts.delete_one({"_id": text_id, "userId": user['userId']})
+        if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Text not found")
         
-        await db.texts.delete_one({"_id": text_id})
+        await usage_counters.texts_changed(user['userId'], -1)
         
         return {"message": "Text deleted successfully"}
     except HTTPException:
@@ -585,43 +1438,124 @@ async def delete_text(text_id: str, user: dict = Depends(verify_token)):
         logging.error(f"Delete text error: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete text")
 
+# Search Route
+# Each searchable collection, the type reported for its hits and the fields fetched per hit
+SEARCH_SOURCES = {
+    "note": ("notes", {"title": 1, "content": 1, "updatedAt": 1}),
+    "text": ("texts", {"title": 1, "content": 1, "updatedAt": 1}),
+    "file": ("files", {"originalName": 1, "fileType": 1, "fileSize": 1, "uploadedAt": 1})
+}
+
+async def _search_collection(collection, user_id: str, q: str, limit: int, after, projection: dict):
+    # The text indexes are prefixed with userId, so this only scans the caller's entries
+    pipeline = [
+        {"$match": {"userId": user_id, "$text": {"$search": q}}},
+        {"$addFields": {"score": {"$meta": "textScore"}}}
+    ]
+    if after:
+        score, last_id = after
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "_id": {"$lt": last_id}}
+        ]}})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {**projection, "score": 1}}
+    ]
+    return await collection.aggregate(pipeline).to_list(limit + 1)
+
+def _format_search_hit(kind: str, doc: dict, terms: list) -> dict:
+    if kind == "file":
+        return {
+            "type": kind,
+            "id": doc['_id'],
+            "title": doc['originalName'],
+            "titleHighlights": highlight(doc['originalName'], terms),
+            "fileType": doc.get('fileType'),
+            "fileSize": doc.get('fileSize'),
+            "uploadedAt": doc.get('uploadedAt'),
+            "score": doc['score']
+        }
+    
+    content_snippet, ranges = snippet(doc.get('content', ''), terms)
+    return {
+        "type": kind,
+        "id": doc['_id'],
+        "title": doc['title'],
+        "titleHighlights": highlight(doc['title'], terms),
+        "snippet": content_snippet,
+        "highlights": ranges,
+        "updatedAt": doc.get('updatedAt'),
+        "score": doc['score']
+    }
+
+@api_router.get("/search")
+async def search(
+    q: str = Query(min_length=1, max_length=200),
+    type: Optional[Literal['note', 'text', 'file']] = None,
+    limit: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    after: Optional[str] = None,
+    user: dict = Depends(verify_token)
+):
+    try:
+        cursor = _decode_cursor(after) if after else None
+        kinds = [type] if type else list(SEARCH_SOURCES)
+        
+        # Rank each collection independently, then merge on (score, _id)
+        batches = await asyncio.gather(*(
+            _search_collection(db[SEARCH_SOURCES[kind][0]], user['userId'], q, limit, cursor, SEARCH_SOURCES[kind][1])
+            for kind in kinds
+        ))
+        hits = sorted(
+            ((kind, doc) for kind, docs in zip(kinds, batches) for doc in docs),
+            key=lambda hit: (hit[1]['score'], hit[1]['_id']),
+            reverse=True
+        )
+        
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = _encode_cursor(hits[-1][1]['score'], hits[-1][1]['_id'])
+        
+        terms = parse_terms(q)
+        return {
+            "results": [_format_search_hit(kind, doc, terms) for kind, doc in hits],
+            "nextCursor": next_cursor
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Search error: {e}")
+        raise HTTPException(status_code=500, detail="Search failed")
+
 # Storage Stats Route
 @api_router.get("/storage/stats")
-async def get_storage_stats(user: dict = Depends(verify_token)):
+async def get_storage_stats(
+    request: Request,
+    response: Response,
+    user: dict = Depends(verify_token),
+    session=Depends(read_session)
+):
     try:
-        # Get all files for user
-        files_cursor = db.files.find({"userId": user['userId']})
-        files = await files_cursor.to_list(10000)
+        not_modified = await _not_modified(request, response, user['userId'], read_from=read_db, session=session)
+        if not_modified:
+            return not_modified
+        
+        usage = await usage_counters.get(user['userId'], read_db, session)
         
         # Calculate total storage used
-        total_used = sum(f.get('fileSize', 0) for f in files)
+        total_used = sum(c['size'] for c in usage['files'].values())
+        file_count = sum(c['count'] for c in usage['files'].values())
         
         # Storage limit (10GB in bytes, configurable)
         storage_limit = 10 * 1024 * 1024 * 1024  # 10GB
         
-        # Calculate storage by type
-        storage_by_type = {}
-        for f in files:
-            file_type = f.get('fileType', 'unknown')
-            # Simplify file type categorization
-            if 'image' in file_type:
-                category = 'Images'
-            elif 'video' in file_type:
-                category = 'Videos'
-            elif 'audio' in file_type:
-                category = 'Audio'
-            elif 'pdf' in file_type:
-                category = 'PDFs'
-            elif 'text' in file_type or 'document' in file_type:
-                category = 'Documents'
-            else:
-                category = 'Other'
-            
-            storage_by_type[category] = storage_by_type.get(category, 0) + f.get('fileSize', 0)
+        # Storage by type
+        storage_by_type = {category: c['size'] for category, c in usage['files'].items()}
         
-        # Count notes and texts
-        notes_count = await db.notes.count_documents({"userId": user['userId']})
-        texts_count = await db.texts.count_documents({"userId": user['userId']})
+        notes_count = usage['notesCount']
+        texts_count = usage['textsCount']
         
         # Estimate storage for notes and texts (rough estimate)
         notes_storage = notes_count * 5000  # ~5KB per note
@@ -634,7 +1568,7 @@ async def get_storage_stats(user: dict = Depends(verify_token)):
             "storageLimit": storage_limit,
             "storageRemaining": max(0, storage_limit - total_used_with_data),
             "percentageUsed": round((total_used_with_data / storage_limit) * 100, 2) if storage_limit > 0 else 0,
-            "fileCount": len(files),
+            "fileCount": file_count,
             "notesCount": notes_count,
             "textsCount": texts_count,
             "storageByType": storage_by_type
@@ -644,62 +1578,60 @@ async def get_storage_stats(user: dict = Depends(verify_token)):
         raise HTTPException(status_code=500, detail="Failed to fetch storage stats")
 
 # Analytics Route
+def _trend_bucket(day, granularity: str):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def _upload_trends(usage_days: dict, days: int, granularity: str, today=None) -> list:
+    today = today or datetime.now(timezone.utc).date()
+    window_start = today - timedelta(days=days - 1)
+    
+    # Lay out the buckets, then fold in the per-day counters for the window.
+    # A week or month that began before the window is labelled with the window start
+    buckets = {}
+    day = window_start
+    while day <= today:
+        bucket = buckets.setdefault(max(_trend_bucket(day, granularity), window_start), {"count": 0, "size": 0})
+        counts = usage_days.get(day.strftime("%Y-%m-%d"))
+        if counts:
+            bucket['count'] += counts.get('count', 0)
+            bucket['size'] += counts.get('size', 0)
+        day += timedelta(days=1)
+    
+    return [
+        {"date": bucket_start.strftime("%Y-%m-%d"), "count": b['count'], "size": b['size']}
+        for bucket_start, b in buckets.items()
+    ]
+
 @api_router.get("/analytics")
-async def get_analytics(user: dict = Depends(verify_token)):
+async def get_analytics(
+    request: Request,
+    response: Response,
+    days: int = Query(31, ge=1, le=366),
+    granularity: Literal['day', 'week', 'month'] = 'day',
+    user: dict = Depends(verify_token),
+    session=Depends(read_session)
+):
     try:
-        # Get all files for user
-        files_cursor = db.files.find({"userId": user['userId']}).sort("uploadedAt", 1)
-        files = await files_cursor.to_list(10000)
+        # Trend windows end today, so a new day invalidates the cached body
+        not_modified = await _not_modified(request, response, user['userId'], datetime.now(timezone.utc).strftime("%Y-%m-%d"), read_from=read_db, session=session)
+        if not_modified:
+            return not_modified
         
-        # Calculate file type distribution
-        file_type_distribution = {}
-        for f in files:
-            file_type = f.get('fileType', 'unknown')
-            # Categorize
-            if 'image' in file_type:
-                category = 'Images'
-            elif 'video' in file_type:
-                category = 'Videos'
-            elif 'audio' in file_type:
-                category = 'Audio'
-            elif 'pdf' in file_type:
-                category = 'PDFs'
-            elif 'text' in file_type or 'document' in file_type:
-                category = 'Documents'
-            else:
-                category = 'Other'
-            
-            file_type_distribution[category] = file_type_distribution.get(category, 0) + 1
+        usage = await usage_counters.get(user['userId'], read_db, session)
+        upload_trends = _upload_trends(usage['days'], days, granularity)
         
-        # Calculate upload trends (last 30 days)
-        upload_trends = []
-        from datetime import timedelta
-        today = datetime.now(timezone.utc)
-        
-        for i in range(30, -1, -1):
-            day = today - timedelta(days=i)
-            day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = day_start + timedelta(days=1)
-            
-            day_files = [f for f in files if day_start.isoformat() <= f.get('uploadedAt', '') < day_end.isoformat()]
-            day_size = sum(f.get('fileSize', 0) for f in day_files)
-            
-            upload_trends.append({
-                "date": day_start.strftime("%Y-%m-%d"),
-                "count": len(day_files),
-                "size": day_size
-            })
-        
-        # Total stats
-        total_storage = sum(f.get('fileSize', 0) for f in files)
-        notes_count = await db.notes.count_documents({"userId": user['userId']})
-        texts_count = await db.texts.count_documents({"userId": user['userId']})
+        # File type distribution
+        file_type_distribution = {category: c['count'] for category, c in usage['files'].items()}
         
         return {
-            "totalFiles": len(files),
-            "totalStorage": total_storage,
-            "notesCount": notes_count,
-            "textsCount": texts_count,
+            "totalFiles": sum(c['count'] for c in usage['files'].values()),
+            "totalStorage": sum(c['size'] for c in usage['files'].values()),
+            "notesCount": usage['notesCount'],
+            "textsCount": usage['textsCount'],
             "fileTypeDistribution": file_type_distribution,
             "uploadTrends": upload_trends
         }
@@ -708,24 +1640,45 @@ async def get_analytics(user: dict = Depends(verify_token)):
         raise HTTPException(status_code=500, detail="Failed to fetch analytics")
 
 # File Download Route
-@api_router.get("/files/download/{file_id}")
-async def download_file(file_id: str, user: dict = Depends(verify_token)):
+@api_router.api_route("/files/download/{file_id}", methods=["GET", "HEAD"])
+async def download_file(
+    file_id: str,
+    request: Request,
+    inline: bool = False,
+    user: dict = Depends(verify_token)
+):
     try:
         # Find file
         file_doc = await db.files.find_one({"_id": file_id, "userId": user['userId']})
         if not file_doc:
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Check if physical file exists
-        file_path = UPLOAD_DIR / file_doc['fileName']
-        if not file_path.exists():
+        # Check the stored object exists
+        try:
+            stat = await storage.stat(file_doc['fileName'])
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="File not found on server")
         
-        # Return file for download
-        return FileResponse(
-            path=file_path,
+        # Blobs are content-addressed, so their hash is a strong validator;
+        # legacy files fall back to size and mtime
+        if file_doc.get('sha256'):
+            etag = f'"{file_doc["sha256"]}"'
+        else:
+            etag = f'"{stat.size:x}-{int(stat.modified):x}"'
+        
+        return RangedFileResponse(
+            storage,
+            file_doc['fileName'],
+            request,
+            size=file_doc['fileSize'] if file_doc.get('codec') else stat.size,
+            media_type=file_doc.get('fileType', 'application/octet-stream'),
+            etag=etag,
+            last_modified=datetime.fromisoformat(file_doc['uploadedAt']),
+            cache_control="private, no-cache",
             filename=file_doc['originalName'],
-            media_type=file_doc.get('fileType', 'application/octet-stream')
+            inline=inline,
+            chunk_size=UPLOAD_CHUNK_SIZE,
+            codec=file_doc.get('codec')
         )
     except HTTPException:
         raise
@@ -733,6 +1686,117 @@ async def download_file(file_id: str, user: dict = Depends(verify_token)):
         logging.error(f"Download file error: {e}")
         raise HTTPException(status_code=500, detail="Failed to download file")
 
+@api_router.get("/files/{file_id}/signed-url")
+async def get_signed_url(file_id: str, user: dict = Depends(verify_token)):
+    try:
+        file_doc = await db.files.find_one({"_id": file_id, "userId": user['userId']})
+        if not file_doc:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        token, expires_at = url_signer.sign(file_doc)
+        return {
+            "url": f"/api/files/signed/{token}",
+            "expiresAt": datetime.fromtimestamp(expires_at, timezone.utc).isoformat()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Sign URL error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create download link")
+
+@api_router.get("/files/{file_id}/thumbnail")
+async def get_thumbnail(
+    file_id: str,
+    request: Request,
+    size: Literal['small', 'medium', 'large'] = 'medium',
+    user: dict = Depends(verify_token)
+):
+    try:
+        file_doc = await db.files.find_one({"_id": file_id, "userId": user['userId']})
+        if not file_doc:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        status = file_doc.get('thumbnails', {}).get('status')
+        if status == 'pending':
+            raise HTTPException(status_code=404, detail="Thumbnail not ready yet", headers={"Retry-After": "2"})
+        if status != 'ready':
+            raise HTTPException(status_code=404, detail="No thumbnail for this file")
+        
+        thumbnail = _thumbnail_doc(file_doc, size)
+        try:
+            stat = await storage.stat(thumbnail['fileName'])
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="No thumbnail for this file")
+        
+        # A file's thumbnails never change, so clients may keep them
+        return RangedFileResponse(
+            storage,
+            thumbnail['fileName'],
+            request,
+            size=stat.size,
+            media_type=THUMBNAIL_MEDIA_TYPE,
+            etag=f'"{thumbnail["sha256"]}"',
+            last_modified=datetime.fromtimestamp(stat.modified, timezone.utc),
+            cache_control="private, max-age=31536000, immutable",
+            filename=thumbnail['originalName'],
+            inline=True
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Get thumbnail error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch thumbnail")
+
+# Signed downloads carry everything needed in the token, so serving them
+# checks the signature and touches neither the JWT nor MongoDB
+@api_router.api_route("/files/signed/{token}", methods=["GET", "HEAD"])
+async def download_signed(token: str, request: Request, download: bool = False):
+    try:
+        claims = url_signer.verify(token)
+        if not claims:
+            raise HTTPException(status_code=403, detail="Invalid or expired link")
+        
+        try:
+            storage.local_path(claims['f'])
+        except ValueError:
+            raise HTTPException(status_code=403, detail="Invalid or expired link")
+        
+        # The URL itself expires, so caches may keep the response until then
+        max_age = max(0, int(claims['e'] - datetime.now(timezone.utc).timestamp()))
+        
+        # Object stores serve uncompressed objects themselves, with a link expiring at the same time
+        if not claims.get('c'):
+            presigned = storage.presign(claims['f'], max_age, claims['n'], claims['t'], inline=not download)
+            if presigned:
+                return RedirectResponse(presigned, status_code=307)
+        
+        try:
+            stat = await storage.stat(claims['f'])
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found on server")
+        
+        etag = f'"{claims["h"]}"' if claims.get('h') else f'"{stat.size:x}-{int(stat.modified):x}"'
+        
+        return RangedFileResponse(
+            storage,
+            claims['f'],
+            request,
+            size=claims['z'] if claims.get('c') else stat.size,
+            media_type=claims['t'],
+            etag=etag,
+            last_modified=datetime.fromtimestamp(stat.modified, timezone.utc),
+            cache_control=f"private, max-age={max_age}",
+            filename=claims['n'],
+            inline=not download,
+            chunk_size=UPLOAD_CHUNK_SIZE,
+            codec=claims.get('c')
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Signed download error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to download file")
+
 # Settings Routes
 class UserSettings(BaseModel):
     theme: Optional[str] = None
@@ -740,8 +1804,12 @@ class UserSettings(BaseModel):
     layoutPreference: Optional[str] = None
 
 @api_router.get("/settings")
-async def get_settings(user: dict = Depends(verify_token)):
+async def get_settings(request: Request, response: Response, user: dict = Depends(verify_token)):
     try:
+        not_modified = await _not_modified(request, response, user['userId'])
+        if not_modified:
+            return not_modified
+        
         user_doc = await db.users.find_one({"_id": user['userId']})
         if not user_doc:
             raise HTTPException(status_code=404, detail="User not found")
@@ -790,6 +1858,7 @@ async def update_settings(settings_data: UserSettings, user: dict = Depends(veri
                 {"_id": user['userId']},
                 {"$set": flat_update}
             )
+            await usage_counters.touch(user['userId'])
         
         return {"message": "Settings updated successfully", "success": True}
     except HTTPException:
@@ -801,8 +1870,11 @@ async def update_settings(settings_data: UserSettings, user: dict = Depends(veri
 # Include the router in the main app
 app.include_router(api_router)
 
-# Serve uploaded files
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type=MetricsRegistry.content_type)
 
 # CORS middleware
 app.add_middleware(
@@ -813,13 +1885,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so the timings include CORS handling
+app.add_middleware(MetricsMiddleware, registry=metrics)
+if tracing.enabled:
+    app.add_middleware(TracingMiddleware, tracing=tracing)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    + (' - trace_id=%(trace_id)s span_id=%(span_id)s' if tracing.enabled else '')
 )
+if tracing.enabled:
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceLogFilter(tracing))
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def provision_indexes():
+    missing = await ensure_indexes(db, slow_query_logger)
+    if missing:
+        logger.error(f"Running without required indexes: {missing}")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.upload_session_janitor = asyncio.create_task(_upload_session_janitor())
+    app.state.blob_janitor = asyncio.create_task(_blob_janitor())
+    loop_monitor.start()
+    
+    # Pick up thumbnails that were still pending when the server last stopped
+    resumed = await thumbnail_generator.resume()
+    if resumed:
+        logger.info(f"Resumed thumbnail generation for {resumed} files")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.upload_session_janitor.cancel()
+    app.state.blob_janitor.cancel()
+    loop_monitor.stop()
     client.close()
+    password_hasher.shutdown()
+    thumbnail_generator.shutdown()
+    tracing.shutdown()
@@ -0,0 +1,69 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+class UrlSigner:
+    """Issues and checks HMAC-SHA256 signed tokens for direct file access.
+
+    A token is ``<payload>.<signature>``, where the payload carries the stored
+    file name, owner, expiry and the response metadata, so serving a token
+    needs no database lookup. Expiries are rounded up to the next
+    ``window``-second boundary: every token issued for a file within one
+    window is identical, which lets browsers cache the signed URL, and is
+    valid for between ``ttl`` and ``ttl + window`` seconds.
+    """
+
+    def __init__(self, secret: str, ttl: int, window: int):
+        self._key = hashlib.sha256(f"signed-url:{secret}".encode()).digest()
+        self.ttl = ttl
+        self.window = max(1, window)
+
+    def current_window(self, now: float = None) -> int:
+        return int(now if now is not None else time.time()) // self.window
+
+    def _signature(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._key, payload.encode(), hashlib.sha256).digest())
+
+    def sign(self, file_doc: dict, now: float = None) -> tuple:
+        """Return ``(token, expires_at)`` for ``file_doc``."""
+        expires_at = (self.current_window(now) + 1) * self.window + self.ttl
+        claims = {
+            "f": file_doc['fileName'],
+            "o": file_doc['userId'],
+            "e": expires_at,
+            "n": file_doc['originalName'],
+            "t": file_doc.get('fileType', 'application/octet-stream'),
+            "h": file_doc.get('sha256'),
+        }
+        if file_doc.get('codec'):
+            # Compressed blobs need the codec and original size to be served
+            claims["c"] = file_doc['codec']
+            claims["z"] = file_doc['fileSize']
+        payload = _b64encode(json.dumps(claims, separators=(',', ':'), sort_keys=True).encode())
+        return f"{payload}.{self._signature(payload)}", expires_at
+
+    def verify(self, token: str, now: float = None):
+        """Return the claims of a valid, unexpired token, else None."""
+        payload, _, signature = token.partition('.')
+        if not payload or not signature:
+            return None
+        if not hmac.compare_digest(signature.encode(), self._signature(payload).encode()):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            return None
+        if claims.get('e', 0) <= (now if now is not None else time.time()):
+            return None
+        return claims
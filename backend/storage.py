@@ -0,0 +1,224 @@
+import os
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+import anyio
+
+
+@dataclass
+class StoredObject:
+    size: int
+    modified: float  # POSIX timestamp
+
+
+def content_disposition(filename: str, inline: bool) -> str:
+    disposition = "inline" if inline else "attachment"
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+class LocalStorage:
+    """Stores objects as files under ``root``; keys are relative paths."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._resolved_root = root.resolve()
+
+    def local_path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self._resolved_root):
+            raise ValueError(f"Key escapes the storage root: {key}")
+        return path
+
+    async def put(self, key: str, source: Path, keep_source: bool = False):
+        def place():
+            target = self.local_path(key)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if not keep_source:
+                os.replace(source, target)
+                return
+            try:
+                os.link(source, target)
+            except FileExistsError:
+                tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex[:8]}")
+                shutil.copyfile(source, tmp)
+                os.replace(tmp, target)
+            except OSError:
+                shutil.copyfile(source, target)
+        await anyio.to_thread.run_sync(place)
+
+    async def exists(self, key: str) -> bool:
+        return await anyio.to_thread.run_sync(self.local_path(key).exists)
+
+    async def stat(self, key: str) -> StoredObject:
+        st = await anyio.to_thread.run_sync(self.local_path(key).stat)
+        return StoredObject(size=st.st_size, modified=st.st_mtime)
+
+    def open(self, key: str, offset: int = 0):
+        # Blocking; returns a binary file positioned at offset. Kept synchronous
+        # because callers already run the open and every read on a worker thread
+        # (RangedFileResponse, assemble_parts); an async wrapper would add a
+        # thread hop per chunk without taking any work off the event loop
+        f = open(self.local_path(key), "rb")
+        if offset:
+            f.seek(offset)
+        return f
+
+    async def delete(self, key: str):
+        await anyio.to_thread.run_sync(lambda: self.local_path(key).unlink(missing_ok=True))
+
+    async def delete_prefix(self, prefix: str):
+        def remove():
+            if prefix.endswith('/'):
+                shutil.rmtree(self.local_path(prefix), ignore_errors=True)
+                return
+            base = self.local_path(prefix)
+            if base.parent.exists():
+                for path in base.parent.glob(f"{base.name}*"):
+                    path.unlink(missing_ok=True)
+        await anyio.to_thread.run_sync(remove)
+
+    def presign(self, key: str, expires_in: int, filename: str, media_type: str, inline: bool = True) -> Optional[str]:
+        # Local files are served by the API itself
+        return None
+
+    @asynccontextmanager
+    async def local_copy(self, key: str):
+        yield self.local_path(key)
+
+
+class S3Storage:
+    """Stores objects in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    Uploads go through boto3's managed transfer, which switches to multipart
+    upload above ``multipart_chunk_size``. boto3 calls are blocking and run on
+    worker threads. ``scratch_dir`` holds temporary local copies.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        scratch_dir: Path,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        multipart_chunk_size: int = 8 * 1024 * 1024
+    ):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = bucket
+        self.scratch_dir = scratch_dir
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self._client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self._transfer_config = TransferConfig(
+            multipart_threshold=multipart_chunk_size,
+            multipart_chunksize=multipart_chunk_size
+        )
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def local_path(self, key: str) -> None:
+        return None
+
+    async def put(self, key: str, source: Path, keep_source: bool = False):
+        await anyio.to_thread.run_sync(lambda: self._client.upload_file(
+            str(source), self.bucket, self._key(key), Config=self._transfer_config
+        ))
+        if not keep_source:
+            await anyio.to_thread.run_sync(lambda: Path(source).unlink(missing_ok=True))
+
+    def _head(self, key: str):
+        from botocore.exceptions import ClientError
+        try:
+            return self._client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(key)
+            raise
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await anyio.to_thread.run_sync(self._head, key)
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def stat(self, key: str) -> StoredObject:
+        head = await anyio.to_thread.run_sync(self._head, key)
+        return StoredObject(size=head['ContentLength'], modified=head['LastModified'].timestamp())
+
+    def open(self, key: str, offset: int = 0):
+        # Blocking; returns the streaming body, starting at offset. Synchronous
+        # for the same reason as LocalStorage.open: call it on a worker thread
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if offset:
+            params["Range"] = f"bytes={offset}-"
+        return self._client.get_object(**params)['Body']
+
+    async def delete(self, key: str):
+        await anyio.to_thread.run_sync(lambda: self._client.delete_object(Bucket=self.bucket, Key=self._key(key)))
+
+    async def delete_prefix(self, prefix: str):
+        def remove():
+            paginator = self._client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+                objects = [{"Key": obj['Key']} for obj in page.get('Contents', [])]
+                if objects:
+                    self._client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+        await anyio.to_thread.run_sync(remove)
+
+    def presign(self, key: str, expires_in: int, filename: str, media_type: str, inline: bool = True) -> Optional[str]:
+        # Computed locally by botocore; no request is made
+        return self._client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._key(key),
+                "ResponseContentType": media_type,
+                "ResponseContentDisposition": content_disposition(filename, inline)
+            },
+            ExpiresIn=max(1, expires_in)
+        )
+
+    @asynccontextmanager
+    async def local_copy(self, key: str):
+        path = self.scratch_dir / uuid.uuid4().hex
+        try:
+            await anyio.to_thread.run_sync(lambda: self._client.download_file(self.bucket, self._key(key), str(path)))
+            yield path
+        finally:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(lambda: path.unlink(missing_ok=True))
+
+
+def create_storage(backend: str, upload_dir: Path, scratch_dir: Path):
+    """Build the storage driver selected by ``backend`` (``local`` or ``s3``).
+
+    The S3 driver reads ``S3_BUCKET``, ``S3_PREFIX``, ``S3_ENDPOINT_URL``,
+    ``S3_REGION`` and ``S3_MULTIPART_CHUNK_SIZE``; credentials come from the
+    standard AWS environment variables or config files.
+    """
+    if backend in (None, '', 'local'):
+        return LocalStorage(upload_dir)
+    if backend == 's3':
+        bucket = os.environ.get('S3_BUCKET')
+        if not bucket:
+            raise Exception("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        return S3Storage(
+            bucket,
+            scratch_dir,
+            prefix=os.environ.get('S3_PREFIX', ''),
+            endpoint_url=os.environ.get('S3_ENDPOINT_URL') or None,
+            region=os.environ.get('S3_REGION') or None,
+            multipart_chunk_size=int(os.environ.get('S3_MULTIPART_CHUNK_SIZE', 8 * 1024 * 1024))
+        )
+    raise Exception(f"Unknown STORAGE_BACKEND: {backend}")
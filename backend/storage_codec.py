@@ -0,0 +1,75 @@
+import logging
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - compression is disabled without zstandard
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Types worth trying to compress; anything else (images, video, archives,
+# zip-based office formats) is already compressed
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/ld+json',
+    'application/x-ndjson',
+    'application/xml',
+    'application/javascript',
+    'application/x-yaml',
+    'application/yaml',
+    'application/sql',
+    'application/rtf',
+    'application/msword',
+    'application/vnd.ms-excel',
+    'application/vnd.ms-powerpoint',
+    'image/svg+xml',
+    'image/bmp',
+)
+
+# Bytes compressed to estimate the ratio, and the saving required to keep it
+SAMPLE_SIZE = 64 * 1024
+MIN_SAVING = 0.1
+
+
+def is_compressible(file_type: Optional[str]) -> bool:
+    return (file_type or '').lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class CodecPolicy:
+    """Decides whether a file is stored compressed, and provides the codec.
+
+    ``codec`` is ``"zstd"`` or ``None`` (store everything as-is). A file is
+    compressed when its type is in ``COMPRESSIBLE_TYPES`` and a sample of its
+    first bytes shrinks by at least ``MIN_SAVING``.
+    """
+
+    def __init__(self, codec: Optional[str], level: int = 3):
+        if codec in (None, '', 'none'):
+            codec = None
+        elif codec != 'zstd':
+            raise ValueError(f"Unknown storage codec: {codec}")
+        elif zstandard is None:
+            logger.error("STORAGE_CODEC=zstd but the zstandard package is not installed; storing uncompressed")
+            codec = None
+        self.codec = codec
+        self.level = level
+
+    def choose(self, file_type: Optional[str], sample: bytes) -> Optional[str]:
+        if not self.codec or not is_compressible(file_type) or len(sample) < 512:
+            return None
+        sample = bytes(sample[:SAMPLE_SIZE])
+        compressed = zstandard.ZstdCompressor(level=self.level).compress(sample)
+        return self.codec if len(compressed) <= len(sample) * (1 - MIN_SAVING) else None
+
+    def compressor(self, codec: str):
+        # Object with compress(data) -> bytes and flush() -> bytes
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+
+def decoding_reader(codec: str, file):
+    # Readable, forward-seekable view of the decompressed contents of ``file``
+    if codec != 'zstd' or zstandard is None:
+        raise ValueError(f"Cannot decode storage codec: {codec}")
+    return zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True)
@@ -0,0 +1,286 @@
+import hashlib
+import mimetypes
+import os
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import anyio
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Room for boundaries and part headers on top of the file payload
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+@dataclass
+class StreamedUpload:
+    filename: str
+    content_type: Optional[str]
+    size: int
+    sha256: str
+    codec: Optional[str] = None
+    stored_size: int = 0
+
+
+class ChunkWriter:
+    """Buffers incoming bytes and writes them out in fixed-size chunks.
+
+    Size and SHA-256 (of the original bytes) are computed as the data passes
+    through, so nothing is ever re-read from disk or held in memory beyond one
+    chunk. With a ``codec_policy`` the first chunk decides whether the file is
+    stored compressed; compression then runs chunk by chunk on a worker thread.
+    Call ``finish`` once all data is written.
+    """
+
+    def __init__(self, file, max_size: int, chunk_size: int, codec_policy=None):
+        self.file = file
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.codec_policy = codec_policy
+        self.file_type = None
+        self.size = 0
+        self.stored_size = 0
+        self.codec = None
+        self.hasher = hashlib.sha256()
+        self._buffer = bytearray()
+        self._compressor = None
+        self._decided = codec_policy is None
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadTooLarge()
+        self.hasher.update(data)
+        self._buffer += data
+        if len(self._buffer) >= self.chunk_size:
+            await self.flush()
+
+    async def _write_out(self, data: bytes):
+        if self._compressor:
+            data = await anyio.to_thread.run_sync(self._compressor.compress, data)
+        if data:
+            await self.file.write(data)
+            self.stored_size += len(data)
+
+    async def flush(self):
+        if not self._decided:
+            self._decided = True
+            self.codec = self.codec_policy.choose(self.file_type, self._buffer)
+            if self.codec:
+                self._compressor = self.codec_policy.compressor(self.codec)
+        if self._buffer:
+            await self._write_out(bytes(self._buffer))
+            self._buffer.clear()
+
+    async def finish(self):
+        await self.flush()
+        if self._compressor:
+            trailer = self._compressor.flush()
+            await self.file.write(trailer)
+            self.stored_size += len(trailer)
+
+
+async def _remove(path):
+    await anyio.to_thread.run_sync(lambda: os.path.exists(path) and os.remove(path))
+
+
+async def stream_upload(
+    request: Request,
+    dest_path,
+    max_size: int,
+    chunk_size: int,
+    field_name: str = "file",
+    check_filename: Optional[Callable[[str], None]] = None,
+    codec_policy=None,
+) -> StreamedUpload:
+    """Stream the ``field_name`` part of a multipart request body to ``dest_path``.
+
+    The body is parsed as it arrives from the socket. ``UploadTooLarge`` is
+    raised as soon as the part exceeds ``max_size`` and ``check_filename`` may
+    raise to reject a part from its headers alone; the partial file is removed
+    in either case. With a ``codec_policy`` the file may be stored compressed,
+    as reported in ``codec`` and ``stored_size``.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidUpload("Expected a multipart/form-data request")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLarge()
+
+    # Parser callbacks are synchronous, so they only queue events which are
+    # then handled (and written) asynchronously after each network chunk.
+    events = []
+    header_field = bytearray()
+    header_value = bytearray()
+    part_headers = {}
+
+    def on_part_begin():
+        part_headers.clear()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        part_headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        events.append(("headers", dict(part_headers)))
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    upload = None
+    in_file_part = False
+    done = False
+
+    try:
+        async with await anyio.open_file(dest_path, "wb") as out:
+            writer = ChunkWriter(out, max_size, chunk_size, codec_policy)
+
+            async for chunk in request.stream():
+                if done:
+                    continue
+                parser.write(chunk)
+
+                for kind, value in events:
+                    if done:
+                        break
+                    if kind == "headers":
+                        _, disposition = parse_options_header(value.get(b"content-disposition"))
+                        name = disposition.get(b"name", b"").decode("latin-1")
+                        filename = disposition.get(b"filename")
+                        in_file_part = name == field_name and filename is not None and upload is None
+                        if in_file_part:
+                            filename = filename.decode("utf-8", errors="replace")
+                            if check_filename:
+                                check_filename(filename)
+                            part_type = value.get(b"content-type")
+                            upload = StreamedUpload(
+                                filename=filename,
+                                content_type=part_type.decode("latin-1") if part_type else None,
+                                size=0,
+                                sha256=""
+                            )
+                            writer.file_type = upload.content_type or mimetypes.guess_type(filename)[0]
+                    elif kind == "data" and in_file_part:
+                        await writer.write(value)
+                    elif kind == "end" and in_file_part:
+                        in_file_part = False
+                        done = True
+                events.clear()
+
+            parser.finalize()
+            await writer.finish()
+    except BaseException:
+        with anyio.CancelScope(shield=True):
+            await _remove(dest_path)
+        raise
+
+    if upload is None or not done:
+        await _remove(dest_path)
+        raise InvalidUpload("No file uploaded")
+
+    upload.size = writer.size
+    upload.sha256 = writer.hasher.hexdigest()
+    upload.codec = writer.codec
+    upload.stored_size = writer.stored_size
+    return upload
+
+
+async def stream_body(request: Request, dest_path, max_size: int, chunk_size: int):
+    """Stream a raw (non-multipart) request body to ``dest_path``.
+
+    Returns ``(size, sha256)``. Same size and cleanup semantics as
+    ``stream_upload``.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        raise UploadTooLarge()
+
+    try:
+        async with await anyio.open_file(dest_path, "wb") as out:
+            writer = ChunkWriter(out, max_size, chunk_size)
+            async for chunk in request.stream():
+                await writer.write(chunk)
+            await writer.finish()
+    except BaseException:
+        with anyio.CancelScope(shield=True):
+            await _remove(dest_path)
+        raise
+
+    return writer.size, writer.hasher.hexdigest()
+
+
+def assemble_parts(part_openers, dest_path, chunk_size: int, codec_policy=None, file_type: Optional[str] = None):
+    """Concatenate parts into ``dest_path`` one chunk at a time.
+
+    ``part_openers`` are callables, in order, each returning a readable binary
+    stream of one part (e.g. bound ``storage.open`` calls). Blocking; run it in a worker thread. With a
+    ``codec_policy`` the output may be compressed, decided from the first
+    chunk as in ``ChunkWriter``.
+    Returns ``(size, sha256, codec, stored_size)``; size and hash are of the
+    assembled original bytes.
+    """
+    hasher = hashlib.sha256()
+    size = stored_size = 0
+    codec = compressor = None
+    try:
+        with open(dest_path, "wb") as out:
+            for open_part in part_openers:
+                with closing(open_part()) as part:
+                    while True:
+                        chunk = part.read(chunk_size)
+                        if not chunk:
+                            break
+                        if size == 0 and codec_policy:
+                            codec = codec_policy.choose(file_type, chunk)
+                            compressor = codec_policy.compressor(codec) if codec else None
+                        hasher.update(chunk)
+                        size += len(chunk)
+                        if compressor:
+                            chunk = compressor.compress(chunk)
+                        out.write(chunk)
+                        stored_size += len(chunk)
+            if compressor:
+                trailer = compressor.flush()
+                out.write(trailer)
+                stored_size += len(trailer)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return size, hasher.hexdigest(), codec, stored_size
@@ -0,0 +1,154 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - thumbnails are disabled without Pillow
+    Image = None
+
+from storage_codec import decoding_reader
+
+logger = logging.getLogger(__name__)
+
+# Bounding box, in pixels, of each thumbnail size
+THUMBNAIL_SIZES = {
+    "small": 128,
+    "medium": 320,
+    "large": 640,
+}
+THUMBNAIL_FORMAT = "webp"
+THUMBNAIL_MEDIA_TYPE = "image/webp"
+
+
+def thumbnail_name(size: str) -> str:
+    return f"thumb-{size}.{THUMBNAIL_FORMAT}"
+
+
+def render_thumbnails(source: str, targets: dict, codec: str = None):
+    """Write one thumbnail per ``{size_name: (path, pixels)}`` entry.
+
+    Runs in a worker process. Sources stored with a ``codec`` are decoded
+    into memory first.
+    """
+    if codec:
+        with open(source, "rb") as f:
+            source = io.BytesIO(decoding_reader(codec, f).read())
+
+    with Image.open(source) as image:
+        largest = max(pixels for _, pixels in targets.values())
+        # Lets JPEG decode at reduced scale instead of full resolution
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+        for path, pixels in sorted(targets.values(), key=lambda t: -t[1]):
+            image.thumbnail((pixels, pixels))
+            tmp_path = f"{path}.tmp"
+            image.save(tmp_path, THUMBNAIL_FORMAT.upper(), quality=80)
+            os.replace(tmp_path, path)
+
+
+class ThumbnailGenerator:
+    """Generates image thumbnails in a process pool, stored beside the source blob.
+
+    Files are marked ``thumbnails.status: pending`` when stored; ``enqueue``
+    schedules them and records ``ready`` or ``failed`` on the file document.
+    ``resume`` re-enqueues everything still pending, e.g. after a restart.
+    ``on_change(user_id)`` is awaited after a file's status changes.
+    Thumbnails are rendered into ``scratch_dir`` and then put into the blob
+    store's storage.
+    """
+
+    def __init__(self, files, blob_store, scratch_dir, workers: int, on_change=None):
+        self.files = files
+        self.blob_store = blob_store
+        self.scratch_dir = scratch_dir
+        self.workers = workers
+        self.on_change = on_change
+        self._executor = None
+        self._tasks = {}
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and self.workers > 0
+
+    def wants(self, file_type: str) -> bool:
+        return self.enabled and (file_type or '').startswith('image/')
+
+    def enqueue(self, file_doc: dict):
+        if file_doc['_id'] in self._tasks:
+            return
+        task = asyncio.create_task(self._generate(file_doc))
+        self._tasks[file_doc['_id']] = task
+        task.add_done_callback(lambda _: self._tasks.pop(file_doc['_id'], None))
+
+    async def resume(self) -> int:
+        if not self.enabled:
+            return 0
+        count = 0
+        async for file_doc in self.files.find(
+            {"thumbnails.status": "pending"},
+            {"_id": 1, "userId": 1, "blobHash": 1, "codec": 1}
+        ):
+            self.enqueue(file_doc)
+            count += 1
+        return count
+
+    async def _render(self, file_doc: dict):
+        storage = self.blob_store.storage
+        digest = file_doc['blobHash']
+        keys = {name: self.blob_store.derivative_key(digest, thumbnail_name(name)) for name in THUMBNAIL_SIZES}
+        # Another file sharing the blob may already have them
+        pending = [name for name, key in keys.items() if not await storage.exists(key)]
+        if not pending:
+            return
+
+        targets = {
+            name: (str(self.scratch_dir / f"{uuid.uuid4().hex}.{THUMBNAIL_FORMAT}"), THUMBNAIL_SIZES[name])
+            for name in pending
+        }
+        if self._executor is None:
+            # Spawned, not forked, so workers do not inherit the event loop or Mongo sockets
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+        try:
+            async with storage.local_copy(self.blob_store.key(digest)) as source:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._executor, render_thumbnails, str(source), targets, file_doc.get('codec')
+                )
+            for name, (path, _) in targets.items():
+                await storage.put(keys[name], path)
+        finally:
+            for path, _ in targets.values():
+                if os.path.exists(path):
+                    os.remove(path)
+
+    async def _generate(self, file_doc: dict):
+        try:
+            await self._render(file_doc)
+            thumbnails = {"status": "ready", "sizes": list(THUMBNAIL_SIZES)}
+        except Exception as e:
+            logger.warning(f"Thumbnail generation failed for {file_doc['_id']}: {e}")
+            thumbnails = {"status": "failed"}
+
+        try:
+            await self.files.update_one(
+                {"_id": file_doc['_id'], "thumbnails.status": "pending"},
+                {"$set": {"thumbnails": thumbnails}}
+            )
+            if self.on_change:
+                await self.on_change(file_doc['userId'])
+        except Exception as e:
+            logger.error(f"Could not record thumbnails for {file_doc['_id']}: {e}")
+
+    def shutdown(self):
+        for task in self._tasks.values():
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
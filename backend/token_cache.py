@@ -0,0 +1,64 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    """LRU cache of verified JWT claims, keyed by a SHA-256 digest of the token.
+
+    Entries live until the token's ``exp``. A hit skips signature checking
+    entirely, so anything that invalidates a token before it expires (logout,
+    revocation) must call ``evict`` or ``evict_user``.
+
+    All methods are synchronous and never await, so under asyncio each call
+    runs atomically on the event loop thread; no locking is needed.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(claims)
+
+    def put(self, token: str, claims: dict):
+        expires_at = claims.get('exp')
+        if not expires_at or self.max_entries <= 0:
+            return
+        key = self._key(token)
+        self._entries[key] = (dict(claims), float(expires_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def evict(self, token: str):
+        self._entries.pop(self._key(token), None)
+
+    def evict_user(self, user_id: str) -> int:
+        keys = [k for k, (claims, _) in self._entries.items() if claims.get('userId') == user_id]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
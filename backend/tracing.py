@@ -0,0 +1,197 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # pragma: no cover - tracing is disabled without opentelemetry-sdk
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracing:
+    """Opt-in OpenTelemetry tracing.
+
+    ``exporter`` is ``"file"`` (one JSON span per line in ``file_path``),
+    ``"otlp"`` (OTLP over HTTP to ``OTEL_EXPORTER_OTLP_ENDPOINT``, e.g. a
+    local collector) or ``None`` to disable tracing, in which case ``span``
+    costs next to nothing. Sampling follows the standard ``OTEL_TRACES_SAMPLER``
+    variables.
+    """
+
+    def __init__(self, exporter, file_path=None, service_name: str = "ecoleaf-backend"):
+        self._provider = None
+        self._tracer = None
+        self._file = None
+        if exporter in (None, '', 'none'):
+            return
+        if exporter not in ('file', 'otlp'):
+            raise ValueError(f"Unknown tracing exporter: {exporter}")
+        if trace is None:
+            logger.error("TRACING_EXPORTER is set but opentelemetry-sdk is not installed; tracing disabled")
+            return
+
+        if exporter == 'file':
+            self._file = open(file_path, "a", buffering=1)
+            span_exporter = ConsoleSpanExporter(out=self._file, formatter=lambda span: span.to_json(indent=None) + "\n")
+        else:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            span_exporter = OTLPSpanExporter()
+
+        self._provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        self._provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        self._tracer = self._provider.get_tracer("ecoleaf")
+
+    @property
+    def enabled(self) -> bool:
+        return self._tracer is not None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Child span of the current one, active for the ``with`` block."""
+        if self._tracer is None:
+            yield _NOOP_SPAN
+            return
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+
+    def start_span(self, name: str, kind=None, attributes=None):
+        # Not made current; the caller ends it (for callbacks that cannot wrap a block)
+        return self._tracer.start_span(name, kind=kind or SpanKind.INTERNAL, attributes=attributes)
+
+    def current_ids(self):
+        """``(trace_id, span_id)`` as hex of the active span, or None."""
+        if self._tracer is None:
+            return None
+        context = trace.get_current_span().get_span_context()
+        if not context.is_valid:
+            return None
+        return f"{context.trace_id:032x}", f"{context.span_id:016x}"
+
+    def shutdown(self):
+        if self._provider is not None:
+            self._provider.shutdown()
+        if self._file is not None:
+            self._file.close()
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request.
+
+    Continues a trace from an incoming ``traceparent`` header and names the
+    span after the route template once routing has matched.
+    """
+
+    def __init__(self, app, tracing: Tracing):
+        self.app = app
+        self.tracing = tracing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracing.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope["headers"]}
+        method = scope["method"]
+        state = {"status": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+
+        with self.tracing._tracer.start_as_current_span(
+            method,
+            context=propagate.extract(headers),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]}
+        ) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.update_name(f"{method} {route}")
+                    span.set_attribute("http.route", route)
+                if state["status"] is not None:
+                    span.set_attribute("http.response.status_code", state["status"])
+                    if state["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+
+
+class CommandTracer(monitoring.CommandListener):
+    """Records a client span per MongoDB command, under the active span.
+
+    Motor runs pymongo on worker threads with a copy of the caller's context,
+    so the request span is current when ``started`` fires.
+    """
+
+    def __init__(self, tracing: Tracing):
+        self.tracing = tracing
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if not self.tracing.enabled:
+            return
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        attributes = {
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+        }
+        if isinstance(collection, str):
+            attributes["db.mongodb.collection"] = collection
+        name = f"{event.command_name} {collection}" if isinstance(collection, str) else event.command_name
+        span = self.tracing.start_span(name, kind=SpanKind.CLIENT, attributes=attributes)
+        with self._lock:
+            self._spans[(event.connection_id, event.request_id)] = span
+
+    def _finish(self, event, error=None):
+        with self._lock:
+            span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is None:
+            return
+        if error is not None:
+            span.set_status(Status(StatusCode.ERROR, error))
+        span.end()
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure.get('errmsg', 'command failed')))
+
+
+class TraceLogFilter(logging.Filter):
+    """Adds ``trace_id`` and ``span_id`` to log records (``-`` outside a span)."""
+
+    def __init__(self, tracing: Tracing):
+        super().__init__()
+        self.tracing = tracing
+
+    def filter(self, record):
+        ids = self.tracing.current_ids()
+        record.trace_id, record.span_id = ids or ("-", "-")
+        return True
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# File categories, matched in order against the MIME type
+FILE_CATEGORY_RULES = [
+    ('image', 'Images'),
+    ('video', 'Videos'),
+    ('audio', 'Audio'),
+    ('pdf', 'PDFs'),
+    ('text', 'Documents'),
+    ('document', 'Documents')
+]
+
+# Per-day upload buckets older than this are dropped when counters are rebuilt
+TREND_HISTORY_DAYS = 366
+
+# Tries at bumping the version on its own after a counter update failed
+VERSION_BUMP_ATTEMPTS = 3
+
+
+def file_category(file_type: str) -> str:
+    for needle, category in FILE_CATEGORY_RULES:
+        if needle in file_type:
+            return category
+    return 'Other'
+
+
+# Same categorization inside MongoDB, for documents stored before `category` existed
+FILE_CATEGORY_EXPR = {
+    "$ifNull": ["$category", {
+        "$switch": {
+            "branches": [
+                {"case": {"$gte": [{"$indexOfCP": [{"$ifNull": ["$fileType", ""]}, needle]}, 0]}, "then": category}
+                for needle, category in FILE_CATEGORY_RULES
+            ],
+            "default": "Other"
+        }
+    }]
+}
+
+
+async def aggregate_usage(db, user_id: str) -> dict:
+    """Compute usage from the source collections in one round trip.
+
+    File sizes and counts per category, plus note and text counts.
+    """
+    pipeline = [
+        {"$match": {"userId": user_id}},
+        {"$group": {
+            "_id": {"kind": "files", "category": FILE_CATEGORY_EXPR},
+            "size": {"$sum": "$fileSize"},
+            "count": {"$sum": 1}
+        }},
+        {"$unionWith": {"coll": "notes", "pipeline": [
+            {"$match": {"userId": user_id}},
+            {"$group": {"_id": {"kind": "notes"}, "count": {"$sum": 1}}}
+        ]}},
+        {"$unionWith": {"coll": "texts", "pipeline": [
+            {"$match": {"userId": user_id}},
+            {"$group": {"_id": {"kind": "texts"}, "count": {"$sum": 1}}}
+        ]}}
+    ]
+
+    usage = {"files": {}, "notesCount": 0, "textsCount": 0}
+    async for row in db.files.aggregate(pipeline):
+        kind = row['_id']['kind']
+        if kind == 'files':
+            usage['files'][row['_id']['category']] = {"size": row['size'], "count": row['count']}
+        else:
+            usage[f"{kind}Count"] = row['count']
+    return usage
+
+
+async def aggregate_upload_days(db, user_id: str, since: str) -> dict:
+    # Upload count and size per day, grouped on the date part of the ISO timestamp
+    pipeline = [
+        {"$match": {"userId": user_id, "uploadedAt": {"$gte": since}}},
+        {"$group": {
+            "_id": {"$substrCP": ["$uploadedAt", 0, 10]},
+            "count": {"$sum": 1},
+            "size": {"$sum": "$fileSize"}
+        }}
+    ]
+    return {
+        row['_id']: {"count": row['count'], "size": row['size']}
+        async for row in db.files.aggregate(pipeline)
+    }
+
+
+def _diff(stored, actual, path=""):
+    # Leaf-by-leaf differences between two nested count documents
+    drift = []
+    for key in sorted(set(stored) | set(actual)):
+        a, b = stored.get(key, 0), actual.get(key, 0)
+        if isinstance(a, dict) or isinstance(b, dict):
+            drift += _diff(a or {}, b or {}, f"{path}{key}.")
+        elif a != b:
+            drift.append({"field": f"{path}{key}", "stored": a, "actual": b})
+    return drift
+
+
+class UsageCounters:
+    """Per-user usage counters kept in ``user_usage``, maintained with ``$inc``.
+
+    Every handler that creates or deletes a file, note or text applies its
+    delta here, so reads are a single document lookup. ``rebuild`` recomputes
+    a document from the source collections and reports any drift.
+
+    The document also carries ``version``, bumped by every write (including
+    ``touch`` for changes that move no counter) and never reset, so it can
+    back ETags for everything the user can read.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db.user_usage
+
+    async def _inc(self, user_id: str, deltas: dict):
+        deltas = {k: v for k, v in deltas.items() if v}
+        deltas['version'] = 1
+        # Counters are derived data: a failed update is logged and left for
+        # reconciliation rather than failing a write that already succeeded
+        try:
+            result = await self.collection.update_one(
+                {"_id": user_id},
+                {"$inc": deltas, "$set": {"updatedAt": datetime.now(timezone.utc).isoformat()}}
+            )
+            if result.matched_count == 0:
+                # No counters yet: build them from the source collections, which
+                # already include the change being recorded
+                await self.rebuild(user_id)
+            return
+        except Exception as e:
+            logger.error(f"Usage counter update failed for {user_id}: {e}")
+        # The version is not derived data: unless it moves, ETags keep answering
+        # 304 for data that changed. Retry it alone, but never fail the request:
+        # its write has already committed and a retrying client would repeat it
+        await self._bump_version(user_id)
+
+    async def _bump_version(self, user_id: str):
+        for attempt in range(VERSION_BUMP_ATTEMPTS):
+            try:
+                # Upserted if the counters do not exist yet; get rebuilds such a document
+                await self.collection.update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+                return
+            except Exception as e:
+                if attempt == VERSION_BUMP_ATTEMPTS - 1:
+                    logger.error(f"Usage version bump failed for {user_id}, cached responses may be stale: {e}")
+                    return
+                logger.warning(f"Usage version bump failed for {user_id}, retrying: {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    @staticmethod
+    def _file_deltas(file_docs, sign: int) -> dict:
+        deltas = {}
+        for file_doc in file_docs:
+            category = file_doc.get('category') or file_category(file_doc.get('fileType', ''))
+            day = file_doc['uploadedAt'][:10]
+            size = file_doc.get('fileSize', 0)
+            for key, value in (
+                (f"files.{category}.size", size),
+                (f"files.{category}.count", 1),
+                (f"days.{day}.size", size),
+                (f"days.{day}.count", 1)
+            ):
+                deltas[key] = deltas.get(key, 0) + sign * value
+        return deltas
+
+    async def files_added(self, user_id: str, *file_docs):
+        await self._inc(user_id, self._file_deltas(file_docs, 1))
+
+    async def files_removed(self, user_id: str, *file_docs):
+        await self._inc(user_id, self._file_deltas(file_docs, -1))
+
+    async def notes_changed(self, user_id: str, delta: int):
+        await self._inc(user_id, {"notesCount": delta})
+
+    async def texts_changed(self, user_id: str, delta: int):
+        await self._inc(user_id, {"textsCount": delta})
+
+    async def touch(self, user_id: str):
+        # Bump the version for changes that do not affect any counter
+        await self._inc(user_id, {})
+
+    async def version(self, user_id: str, read_from=None, session=None) -> int:
+        # read_from: database handle to read with, e.g. one preferring secondaries
+        doc = await (read_from or self.db).user_usage.find_one({"_id": user_id}, {"version": 1}, session=session)
+        return doc.get('version', 0) if doc else 0
+
+    async def get(self, user_id: str, read_from=None, session=None) -> dict:
+        """Return ``{files, notesCount, textsCount, days}`` for ``user_id``.
+
+        Users without a counters document (e.g. created before counters
+        existed) are rebuilt from the source collections on first read.
+        ``read_from`` and ``session`` are the database handle and session to
+        read with, as for ``version``.
+        """
+        doc = await (read_from or self.db).user_usage.find_one({"_id": user_id}, session=session)
+        if doc is None or 'files' not in doc:
+            # Missing, or holding only a version bumped after a failed update
+            doc, _ = await self.rebuild(user_id)
+        return {
+            "files": {c: v for c, v in doc.get('files', {}).items() if v.get('count', 0) > 0},
+            "notesCount": doc.get('notesCount', 0),
+            "textsCount": doc.get('textsCount', 0),
+            "days": doc.get('days', {})
+        }
+
+    async def rebuild(self, user_id: str, dry_run: bool = False):
+        """Recompute the counters from source collections.
+
+        Returns ``(document, drift)`` where ``drift`` lists every counter whose
+        stored value differed. Writes racing the rebuild can be lost, so run it
+        when the user is idle or follow up with another pass.
+        """
+        since = (datetime.now(timezone.utc) - timedelta(days=TREND_HISTORY_DAYS)).strftime("%Y-%m-%d")
+        usage = await aggregate_usage(self.db, user_id)
+        days = await aggregate_upload_days(self.db, user_id, since)
+
+        doc = {
+            "files": usage['files'],
+            "notesCount": usage['notesCount'],
+            "textsCount": usage['textsCount'],
+            "days": days,
+            "updatedAt": datetime.now(timezone.utc).isoformat()
+        }
+
+        stored = await self.collection.find_one({"_id": user_id}) or {}
+        # Buckets past the history window are pruned rather than reported
+        stored_days = {d: v for d, v in stored.get('days', {}).items() if d >= since}
+        drift = _diff(
+            {"files": stored.get('files', {}), "notesCount": stored.get('notesCount', 0),
+             "textsCount": stored.get('textsCount', 0), "days": stored_days},
+            {"files": doc['files'], "notesCount": doc['notesCount'],
+             "textsCount": doc['textsCount'], "days": doc['days']}
+        )
+
+        if not dry_run:
+            # $set rather than a replace so the version keeps counting up
+            doc = await self.collection.find_one_and_update(
+                {"_id": user_id},
+                {"$set": doc, "$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        return doc, drift
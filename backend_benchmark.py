@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Load-testing and benchmark harness for the FastAPI backend
+
+Drives concurrent login, upload, list, stats and download traffic with an
+async client and reports p50/p95/p99 latency, requests per second and
+server RSS per endpoint. Each endpoint is first run on its own, then as a
+weighted mix. Results are written as JSON so runs can be compared with
+--compare.
+
+Against a running server:
+    python backend_benchmark.py --base-url http://localhost:8001/api
+
+Booting backend/server.py (against MONGO_URL, or mongomock with --mongomock):
+    python backend_benchmark.py --spawn --mongomock --concurrency 32 --duration 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / 'backend'
+
+ENDPOINTS = ['login', 'upload', 'list', 'stats', 'download']
+DEFAULT_MIX = 'login=1,upload=1,list=4,stats=2,download=3'
+PASSWORD = 'benchmark-password'
+
+# Runs server.py against an in-memory mongomock database. mongomock ignores
+# partial index filters, so index creation is skipped as in a fresh dev setup,
+# and it lacks $unionWith/$substrCP, so the usage aggregations run in Python
+MONGOMOCK_BOOTSTRAP = """
+import sys
+import mongomock_motor, motor.motor_asyncio, uvicorn
+motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+import server, usage
+
+async def _skip_indexes(db, slow_query_logger=None):
+    return {}
+
+async def _aggregate_usage(db, user_id):
+    result = {'files': {}, 'notesCount': 0, 'textsCount': 0}
+    async for f in db.files.find({'userId': user_id}):
+        c = result['files'].setdefault(f.get('category') or usage.file_category(f['fileType']), {'size': 0, 'count': 0})
+        c['size'] += f['fileSize']
+        c['count'] += 1
+    result['notesCount'] = await db.notes.count_documents({'userId': user_id})
+    result['textsCount'] = await db.texts.count_documents({'userId': user_id})
+    return result
+
+async def _aggregate_upload_days(db, user_id, since):
+    days = {}
+    async for f in db.files.find({'userId': user_id, 'uploadedAt': {'$gte': since}}):
+        day = days.setdefault(f['uploadedAt'][:10], {'count': 0, 'size': 0})
+        day['count'] += 1
+        day['size'] += f['fileSize']
+    return days
+
+server.ensure_indexes = _skip_indexes
+usage.aggregate_usage = _aggregate_usage
+usage.aggregate_upload_days = _aggregate_upload_days
+uvicorn.run(server.app, host='127.0.0.1', port=int(sys.argv[1]), log_level='warning')
+"""
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def read_rss(pid):
+    """Resident set size of ``pid`` in bytes, or None when unavailable."""
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except Exception:
+        return None
+
+
+def parse_mix(value):
+    weights = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class ServerProcess:
+    """Boots backend/server.py with uvicorn on a free local port."""
+
+    def __init__(self, mongomock=False):
+        self.mongomock = mongomock
+        self.process = None
+        self.port = None
+        self.upload_dir = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/api"
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def start(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+
+        env = dict(os.environ)
+        if self.mongomock:
+            env.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+            # The file records die with the in-memory database, so the files go too
+            self.upload_dir = tempfile.mkdtemp(prefix='ecoleaf-benchmark-')
+            env['UPLOAD_DIR'] = self.upload_dir
+            command = [sys.executable, '-c', MONGOMOCK_BOOTSTRAP, str(self.port)]
+        else:
+            command = [
+                sys.executable, '-m', 'uvicorn', 'server:app',
+                '--host', '127.0.0.1', '--port', str(self.port), '--log-level', 'warning'
+            ]
+        self.process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+    async def wait_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {self.process.returncode}")
+                try:
+                    response = await client.get(f"{self.base_url}/")
+                    if response.status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError("Server did not become ready in time")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.upload_dir:
+            shutil.rmtree(self.upload_dir, ignore_errors=True)
+            self.upload_dir = None
+
+
+class BenchmarkUser:
+    def __init__(self, email):
+        self.email = email
+        self.token = None
+        self.file_ids = []
+        self.uploaded_ids = []
+
+    @property
+    def headers(self):
+        return {'Authorization': f'Bearer {self.token}'}
+
+
+class Recorder:
+    """Collects per-endpoint latencies and status codes for one phase."""
+
+    def __init__(self, warmup_until):
+        self.warmup_until = warmup_until
+        self.samples = {}
+        self.status_codes = {}
+        self.errors = {}
+
+    def record(self, endpoint, started, elapsed, status):
+        if started < self.warmup_until:
+            return
+        self.samples.setdefault(endpoint, []).append(elapsed)
+        codes = self.status_codes.setdefault(endpoint, {})
+        codes[str(status)] = codes.get(str(status), 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, duration):
+        endpoints = {}
+        for endpoint, samples in self.samples.items():
+            samples.sort()
+            endpoints[endpoint] = {
+                "count": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                "statusCodes": self.status_codes[endpoint],
+                "rps": round(len(samples) / duration, 2),
+                "latencyMs": {
+                    "p50": round(percentile(samples, 50) * 1000, 2),
+                    "p95": round(percentile(samples, 95) * 1000, 2),
+                    "p99": round(percentile(samples, 99) * 1000, 2),
+                    "mean": round(sum(samples) / len(samples) * 1000, 2),
+                    "max": round(samples[-1] * 1000, 2)
+                }
+            }
+        total = sum(e["count"] for e in endpoints.values())
+        return {"requests": total, "rps": round(total / duration, 2), "endpoints": endpoints}
+
+
+class Benchmark:
+    def __init__(self, args, base_url, server_pid=None):
+        self.args = args
+        self.base_url = base_url.rstrip('/')
+        self.server_pid = server_pid
+        self.users = []
+        self.upload_body = os.urandom(args.upload_size)
+
+    async def setup(self, client):
+        """Register and log in the benchmark users and seed files to list and download."""
+        run_id = uuid.uuid4().hex[:8]
+        for i in range(self.args.users):
+            user = BenchmarkUser(f"bench-{run_id}-{i}@example.com")
+            response = await client.post(
+                f"{self.base_url}/auth/register", json={"email": user.email, "password": PASSWORD}
+            )
+            response.raise_for_status()
+            response = await client.post(
+                f"{self.base_url}/auth/login", json={"email": user.email, "password": PASSWORD}
+            )
+            response.raise_for_status()
+            user.token = response.json()['token']
+
+            for n in range(self.args.seed_files):
+                response = await client.post(
+                    f"{self.base_url}/files/upload",
+                    headers=user.headers,
+                    files={"file": (f"seed-{n}.bin", os.urandom(self.args.upload_size), "application/octet-stream")}
+                )
+                response.raise_for_status()
+                user.file_ids.append(response.json()['file']['id'])
+            user.uploaded_ids.extend(user.file_ids)
+            self.users.append(user)
+
+    async def teardown(self, client):
+        for user in self.users:
+            ids = user.uploaded_ids
+            for start in range(0, len(ids), 500):
+                await client.request(
+                    "DELETE", f"{self.base_url}/files/bulk",
+                    headers=user.headers, json={"ids": ids[start:start + 500]}
+                )
+
+    async def call(self, client, endpoint, user):
+        if endpoint == 'login':
+            return await client.post(
+                f"{self.base_url}/auth/login", json={"email": user.email, "password": PASSWORD}
+            )
+        if endpoint == 'upload':
+            response = await client.post(
+                f"{self.base_url}/files/upload",
+                headers=user.headers,
+                files={"file": ("bench.bin", self.upload_body, "application/octet-stream")}
+            )
+            if response.status_code == 200:
+                user.uploaded_ids.append(response.json()['file']['id'])
+            return response
+        if endpoint == 'list':
+            return await client.get(f"{self.base_url}/files", headers=user.headers)
+        if endpoint == 'stats':
+            return await client.get(f"{self.base_url}/storage/stats", headers=user.headers)
+        if endpoint == 'download':
+            file_id = random.choice(user.file_ids)
+            return await client.get(f"{self.base_url}/files/download/{file_id}", headers=user.headers)
+        raise ValueError(endpoint)
+
+    async def worker(self, client, index, weights, recorder, deadline):
+        user = self.users[index % len(self.users)]
+        names, shares = list(weights), list(weights.values())
+        while time.monotonic() < deadline:
+            endpoint = random.choices(names, shares)[0]
+            started = time.monotonic()
+            try:
+                response = await self.call(client, endpoint, user)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            recorder.record(endpoint, started, time.monotonic() - started, status)
+
+    async def sample_rss(self, samples, stop):
+        while not stop.is_set():
+            rss = read_rss(self.server_pid)
+            if rss is not None:
+                samples.append(rss)
+            try:
+                await asyncio.wait_for(stop.wait(), 0.1)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_phase(self, client, name, weights):
+        start = time.monotonic()
+        warmup_until = start + self.args.warmup
+        deadline = warmup_until + self.args.duration
+        recorder = Recorder(warmup_until)
+
+        rss_samples, stop = [], asyncio.Event()
+        sampler = asyncio.create_task(self.sample_rss(rss_samples, stop))
+        await asyncio.gather(*(
+            self.worker(client, i, weights, recorder, deadline) for i in range(self.args.concurrency)
+        ))
+        stop.set()
+        await sampler
+
+        # Requests in flight at the deadline finish late; measure over the actual span
+        duration = max(time.monotonic() - warmup_until, 1e-9)
+        result = recorder.summary(duration)
+        result["durationSeconds"] = round(duration, 2)
+        if rss_samples:
+            result["rssBytes"] = {"start": rss_samples[0], "peak": max(rss_samples), "end": rss_samples[-1]}
+        return result
+
+    async def run(self):
+        limits = httpx.Limits(max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=self.args.timeout) as client:
+            await self.setup(client)
+            phases = {}
+            try:
+                for name in self.args.phases:
+                    weights = self.args.mix if name == 'mix' else {name: 1}
+                    print(f"Running {name} for {self.args.duration}s at concurrency {self.args.concurrency}...")
+                    phases[name] = await self.run_phase(client, name, weights)
+            finally:
+                if not self.args.keep_data:
+                    await self.teardown(client)
+            return phases
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results, baseline=None):
+    header = f"{'phase':<10} {'endpoint':<10} {'count':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}"
+    print()
+    print(header)
+    print('-' * len(header))
+    for phase, result in results['phases'].items():
+        rss = result.get('rssBytes', {}).get('peak')
+        for endpoint, stats in sorted(result['endpoints'].items()):
+            latency = stats['latencyMs']
+            rss_mb = f"{rss / 1024 / 1024:.1f}" if rss else '-'
+            print(
+                f"{phase:<10} {endpoint:<10} {stats['count']:>7} {stats['errors']:>5} {stats['rps']:>9.1f} "
+                f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} {rss_mb:>12}"
+            )
+            before = (baseline or {}).get('phases', {}).get(phase, {}).get('endpoints', {}).get(endpoint)
+            if before:
+                print(
+                    f"{'':<21} vs baseline: rps {_change(before['rps'], stats['rps'])}, "
+                    f"p95 {_change(before['latencyMs']['p95'], latency['p95'])}, "
+                    f"p99 {_change(before['latencyMs']['p99'], latency['p99'])}"
+                )
+
+
+def _change(before, after):
+    if not before:
+        return 'n/a'
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend API under concurrent load")
+    parser.add_argument('--base-url', default='http://localhost:8001/api', help="API to benchmark (ignored with --spawn)")
+    parser.add_argument('--spawn', action='store_true', help="Boot backend/server.py on a free port for the run")
+    parser.add_argument('--mongomock', action='store_true', help="With --spawn, use an in-memory mongomock database")
+    parser.add_argument('--server-pid', type=int, help="PID of an already running server, for RSS sampling")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent clients")
+    parser.add_argument('--duration', type=float, default=10, help="Measured seconds per phase")
+    parser.add_argument('--warmup', type=float, default=2, help="Unmeasured seconds at the start of each phase")
+    parser.add_argument('--phases', type=lambda v: v.split(','), default=ENDPOINTS + ['mix'],
+                        help="Comma-separated phases to run: endpoint names and/or 'mix'")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Endpoint weights for the mix phase (default {DEFAULT_MIX})")
+    parser.add_argument('--users', type=int, default=4, help="Benchmark users the clients are spread across")
+    parser.add_argument('--seed-files', type=int, default=20, help="Files uploaded per user before the run")
+    parser.add_argument('--upload-size', type=int, default=256 * 1024, help="Bytes per uploaded file")
+    parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument('--keep-data', action='store_true', help="Do not delete uploaded files afterwards")
+    parser.add_argument('--output', default='test_reports/benchmark.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', help="Earlier results file to print changes against")
+    args = parser.parse_args()
+
+    for phase in args.phases:
+        if phase != 'mix' and phase not in ENDPOINTS:
+            parser.error(f"Unknown phase: {phase}")
+
+    server = None
+    base_url, server_pid = args.base_url, args.server_pid
+    if args.spawn:
+        server = ServerProcess(mongomock=args.mongomock)
+        server.start()
+        base_url, server_pid = server.base_url, server.pid
+
+    async def run():
+        if server:
+            await server.wait_ready()
+        return await Benchmark(args, base_url, server_pid).run()
+
+    try:
+        phases = asyncio.run(run())
+    finally:
+        if server:
+            server.stop()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "baseUrl": base_url,
+            "database": "mongomock" if args.spawn and args.mongomock else "mongodb",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "users": args.users,
+            "uploadSize": args.upload_size,
+            "mix": args.mix
+        },
+        "phases": phases
+    }
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(results, baseline)
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
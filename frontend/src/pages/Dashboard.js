@@ -131,16 +131,28 @@ const Dashboard = () => {
     }
   }, [activeSection, isAuthenticated]);
 
+  // Fetch every page of a paginated list endpoint
+  const fetchAllPages = async (path, key) => {
+    const items = [];
+    let after = null;
+    do {
+      const response = await axios.get(`${API}/${path}`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { limit: 500, ...(after ? { after } : {}) }
+      });
+      items.push(...(response.data[key] || []));
+      after = response.data.nextCursor;
+    } while (after);
+    return items;
+  };
+
   // Fetch files
   const fetchFiles = async () => {
     setFilesLoading(true);
     setError('');
     
     try {
-      const response = await axios.get(`${API}/files`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setFiles(response.data.files || []);
+      setFiles(await fetchAllPages('files', 'files'));
     } catch (error) {
       console.error('Fetch files error:', error);
       if (error.response?.status === 401) {
@@ -189,10 +201,7 @@ const Dashboard = () => {
     setNotesLoading(true);
     
     try {
-      const response = await axios.get(`${API}/notes`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setNotes(response.data.notes || []);
+      setNotes(await fetchAllPages('notes', 'notes'));
     } catch (error) {
       console.error('Fetch notes error:', error);
       if (error.response?.status === 401) {
@@ -209,10 +218,7 @@ const Dashboard = () => {
     setTextsLoading(true);
     
     try {
-      const response = await axios.get(`${API}/texts`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setTexts(response.data.texts || []);
+      setTexts(await fetchAllPages('texts', 'texts'));
     } catch (error) {
       console.error('Fetch texts error:', error);
       if (error.response?.status === 401) {
@@ -825,8 +831,9 @@ const Dashboard = () => {
                             <div className="aspect-square bg-gray-100 rounded-lg mb-3 flex items-center justify-center relative overflow-hidden">
                               {file.fileType.includes('image') ? (
                                 <img 
-                                  src={`${BACKEND_URL}${file.fileUrl}`} 
+                                  src={`${BACKEND_URL}${file.thumbnailUrl || file.signedUrl}`} 
                                   alt={file.originalName}
+                                  loading="lazy"
                                   className="w-full h-full object-cover"
                                 />
                               ) : (
@@ -1336,13 +1343,27 @@ const Dashboard = () => {
             <div className="p-6">
               {previewFile.fileType.includes('image') ? (
                 <img 
-                  src={`${BACKEND_URL}${previewFile.fileUrl}`} 
+                  src={`${BACKEND_URL}${previewFile.signedUrl}`} 
                   alt={previewFile.originalName}
                   className="max-w-full max-h-[70vh] mx-auto"
                 />
+              ) : previewFile.fileType.includes('video') ? (
+                <video
+                  src={`${BACKEND_URL}${previewFile.signedUrl}`}
+                  controls
+                  preload="metadata"
+                  className="max-w-full max-h-[70vh] mx-auto"
+                />
+              ) : previewFile.fileType.includes('audio') ? (
+                <audio
+                  src={`${BACKEND_URL}${previewFile.signedUrl}`}
+                  controls
+                  preload="metadata"
+                  className="w-full"
+                />
               ) : previewFile.fileType.includes('pdf') ? (
                 <iframe
-                  src={`${BACKEND_URL}${previewFile.fileUrl}`}
+                  src={`${BACKEND_URL}${previewFile.signedUrl}`}
                   className="w-full h-[70vh]"
                   title={previewFile.originalName}
                 />
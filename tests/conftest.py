@@ -0,0 +1,51 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules import each other as top-level modules, as when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture(scope="session")
+def server():
+    # server.py against an in-memory MongoDB
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import motor.motor_asyncio
+
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ['THUMBNAIL_WORKERS'] = '0'
+    motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+    import server
+    return server
+
+
+@pytest.fixture
+def app(server, tmp_path, monkeypatch):
+    # Files stored under tmp_path, with unreferenced blobs collectable at once
+    from blob_store import BlobStore
+    from storage import LocalStorage
+
+    storage = LocalStorage(tmp_path / 'store')
+    incoming = tmp_path / 'incoming'
+    incoming.mkdir()
+    monkeypatch.setattr(server, 'storage', storage)
+    monkeypatch.setattr(server, 'blob_store', BlobStore(server.db.blobs, storage, grace=0))
+    monkeypatch.setattr(server, 'INCOMING_DIR', incoming)
+    return server
+
+
+@pytest.fixture
+def auth(server):
+    import jwt
+
+    def headers(user_id):
+        token = jwt.encode({"userId": user_id, "exp": 4102444800}, server.JWT_SECRET, algorithm='HS256')
+        return {"Authorization": f"Bearer {token}"}
+    return headers
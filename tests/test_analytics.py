@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+# A Wednesday
+TODAY = date(2024, 5, 15)
+USAGE_DAYS = {
+    "2024-04-01": {"count": 9, "size": 900},  # before every window below
+    "2024-05-08": {"count": 1, "size": 10},
+    "2024-05-13": {"count": 2, "size": 20},
+    "2024-05-15": {"count": 4, "size": 40},
+}
+
+
+def test_daily_buckets_cover_the_window(server):
+    trends = server._upload_trends(USAGE_DAYS, 3, 'day', today=TODAY)
+    assert trends == [
+        {"date": "2024-05-13", "count": 2, "size": 20},
+        {"date": "2024-05-14", "count": 0, "size": 0},
+        {"date": "2024-05-15", "count": 4, "size": 40},
+    ]
+
+
+def test_first_week_is_labelled_with_the_window_start(server):
+    # Window 2024-05-08 (Wednesday) .. 2024-05-15; its first week began on Monday 05-06
+    trends = server._upload_trends(USAGE_DAYS, 8, 'week', today=TODAY)
+    assert trends == [
+        {"date": "2024-05-08", "count": 1, "size": 10},
+        {"date": "2024-05-13", "count": 6, "size": 60},
+    ]
+
+
+def test_first_month_is_labelled_with_the_window_start(server):
+    # Window 2024-04-16 .. 2024-05-15; April began before it
+    trends = server._upload_trends(USAGE_DAYS, 30, 'month', today=TODAY)
+    assert trends == [
+        {"date": "2024-04-16", "count": 0, "size": 0},
+        {"date": "2024-05-01", "count": 7, "size": 70},
+    ]
+
+
+def test_window_starting_on_a_bucket_boundary_is_unchanged(server):
+    # Window 2024-05-06 (Monday) .. 2024-05-15
+    trends = server._upload_trends(USAGE_DAYS, 10, 'week', today=TODAY)
+    assert [t["date"] for t in trends] == ["2024-05-06", "2024-05-13"]
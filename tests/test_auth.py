@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip("mongomock_motor")
+httpx = pytest.importorskip("httpx")
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_duplicate_registration_skips_bcrypt(app, monkeypatch):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as client:
+        user = {"email": "Dup@Example.com", "password": "secret1"}
+        assert (await client.post('/api/auth/register', json=user)).status_code == 200
+
+        async def no_hashing(*args):
+            raise AssertionError("bcrypt ran for a duplicate registration")
+        monkeypatch.setattr(app, 'hash_password', no_hashing)
+
+        response = await client.post('/api/auth/register', json={**user, "email": "dup@example.com"})
+        assert response.status_code == 400
+        assert await app.db.users.count_documents({"email": "dup@example.com"}) == 1
@@ -0,0 +1,98 @@
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from blob_store import BlobStore
+from storage import LocalStorage
+
+pytestmark = pytest.mark.anyio
+
+DIGEST = "ab" * 32
+
+
+@pytest.fixture
+def collection():
+    return mongomock_motor.AsyncMongoMockClient()['test'].blobs
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(tmp_path / 'store')
+
+
+def _source(tmp_path, name, data=b"shared content"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+async def test_first_add_stores_and_later_adds_reference(tmp_path, collection, storage):
+    blob_store = BlobStore(collection, storage)
+
+    first = await blob_store.add(_source(tmp_path, 'a'), DIGEST, 14)
+    second = await blob_store.add(_source(tmp_path, 'b'), DIGEST, 14)
+
+    assert first.created and not second.created
+    assert not (tmp_path / 'b').exists()
+    doc = await collection.find_one({"_id": DIGEST})
+    assert doc['refCount'] == 2 and doc['state'] == 'ready'
+
+
+async def test_release_keeps_blob_until_collected(tmp_path, collection, storage):
+    blob_store = BlobStore(collection, storage, grace=0)
+    await blob_store.add(_source(tmp_path, 'a'), DIGEST, 14)
+
+    await blob_store.release(DIGEST)
+    assert await storage.exists(blob_store.key(DIGEST))
+
+    assert await blob_store.collect() == 1
+    assert not await storage.exists(blob_store.key(DIGEST))
+    assert await collection.find_one({"_id": DIGEST}) is None
+
+
+async def test_add_on_another_replica_revives_released_blob(tmp_path, collection, storage):
+    # Two processes sharing the collection and storage, as with several workers or replicas
+    replica_a = BlobStore(collection, storage, grace=0)
+    replica_b = BlobStore(collection, storage, grace=0)
+    await replica_a.add(_source(tmp_path, 'a'), DIGEST, 14)
+
+    await replica_a.release(DIGEST)
+    revived = await replica_b.add(_source(tmp_path, 'b'), DIGEST, 14)
+    assert not revived.created
+
+    assert await replica_a.collect() == 0
+    assert storage.local_path(replica_b.key(DIGEST)).read_bytes() == b"shared content"
+
+
+async def test_add_after_collection_stores_again(tmp_path, collection, storage):
+    blob_store = BlobStore(collection, storage, grace=0)
+    await blob_store.add(_source(tmp_path, 'a'), DIGEST, 14)
+    await blob_store.release(DIGEST)
+    await blob_store.collect()
+
+    blob = await blob_store.add(_source(tmp_path, 'b'), DIGEST, 14)
+    assert blob.created
+    assert await storage.exists(blob_store.key(DIGEST))
+
+
+async def test_failed_store_drops_the_reference(tmp_path, collection, storage):
+    blob_store = BlobStore(collection, storage)
+
+    with pytest.raises(FileNotFoundError):
+        await blob_store.add(tmp_path / 'missing', DIGEST, 14)
+
+    doc = await collection.find_one({"_id": DIGEST})
+    assert doc['refCount'] == 0 and doc['state'] == 'pending'
+
+
+async def test_add_takes_over_a_pending_blob_whose_lease_expired(tmp_path, collection, storage):
+    # Left behind by a process that stopped while storing the blob
+    await collection.insert_one({"_id": DIGEST, "refCount": 1, "state": "pending", "pendingSince": "1970-01-01T00:00:00+00:00"})
+    blob_store = BlobStore(collection, storage)
+
+    blob = await blob_store.add(_source(tmp_path, 'a'), DIGEST, 14)
+
+    assert blob.created
+    assert await storage.exists(blob_store.key(DIGEST))
+    doc = await collection.find_one({"_id": DIGEST})
+    assert doc['refCount'] == 2 and doc['state'] == 'ready'
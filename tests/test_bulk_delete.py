@@ -0,0 +1,96 @@
+import asyncio
+import functools
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+httpx = pytest.importorskip("httpx")
+
+pytestmark = pytest.mark.anyio
+
+
+class _Delayed:
+    # Yields to the event loop before every operation, so concurrent requests interleave
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def delayed(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return await attr(*args, **kwargs)
+        return delayed
+
+
+class _DelayedFiles:
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name):
+        collection = getattr(self._db, name)
+        return _Delayed(collection) if name == 'files' else collection
+
+
+async def test_concurrent_deletes_release_a_shared_blob_once(app, auth):
+    owner, other = auth('owner'), auth('other')
+    await app.db.user_usage.insert_many([{"_id": user_id, "files": {}} for user_id in ('owner', 'other')])
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # The same content from two users is stored once, with two references
+        uploads = [
+            await client.post('/api/files/upload', files={"file": ("a.txt", b"shared content")}, headers=headers)
+            for headers in (owner, other)
+        ]
+        file_id, other_id = (r.json()['file']['id'] for r in uploads)
+        digest = (await app.db.files.find_one({"_id": file_id}))['blobHash']
+        assert (await app.db.blobs.find_one({"_id": digest}))['refCount'] == 2
+
+        db = app.db
+        app.db = _DelayedFiles(db)
+        try:
+            responses = await asyncio.gather(
+                client.request('DELETE', '/api/files/bulk', json={"ids": [file_id]}, headers=owner),
+                client.request('DELETE', '/api/files/bulk', json={"ids": [file_id]}, headers=owner),
+                client.delete(f'/api/files/{file_id}', headers=owner)
+            )
+        finally:
+            app.db = db
+
+        bulk_deleted = sum(r.json()['deleted'] for r in responses[:2])
+        single_deleted = responses[2].status_code == 200
+        assert bulk_deleted + single_deleted == 1
+
+        assert (await app.db.blobs.find_one({"_id": digest}))['refCount'] == 1
+        await app.blob_store.collect()
+        download = await client.get(f'/api/files/download/{other_id}', headers=other)
+        assert download.status_code == 200
+        assert download.content == b"shared content"
+
+
+async def test_bulk_note_delete_counts_only_owned_notes(app, auth):
+    owner, other = auth('note-owner'), auth('note-other')
+    await app.db.user_usage.insert_many([{"_id": user_id, "files": {}} for user_id in ('note-owner', 'note-other')])
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        created = await client.post('/api/notes/bulk', json={"notes": [
+            {"title": "a", "content": "a"}, {"title": "b", "content": "b"}
+        ]}, headers=owner)
+        note_ids = [r['id'] for r in created.json()['results']]
+        foreign = await client.post('/api/notes/bulk', json={"notes": [{"title": "c", "content": "c"}]}, headers=other)
+        foreign_id = foreign.json()['results'][0]['id']
+
+        ids = [note_ids[0], note_ids[0], note_ids[1], foreign_id]
+        response = await client.request('DELETE', '/api/notes/bulk', json={"ids": ids}, headers=owner)
+
+    assert response.json()['deleted'] == 2
+    assert response.json()['results'] == [
+        {"id": note_ids[0], "status": "deleted"},
+        {"id": note_ids[1], "status": "deleted"},
+        {"id": foreign_id, "status": "not_found"},
+    ]
+    assert await app.db.notes.find_one({"_id": foreign_id})
+    assert (await app.usage_counters.get('note-owner'))['notesCount'] == 0
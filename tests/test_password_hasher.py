@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import pytest
+
+from password_hasher import PasswordHasher, PasswordHasherBusy
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cancelled_request_counts_until_its_job_finishes():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    release = threading.Event()
+    try:
+        task = asyncio.create_task(hasher._run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # The job is still running on the pool, so the pool is still full
+        assert hasher.in_flight == 1
+        with pytest.raises(PasswordHasherBusy):
+            await hasher._run(lambda: None)
+
+        release.set()
+        for _ in range(100):
+            if hasher.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert hasher.in_flight == 0
+    finally:
+        release.set()
+        hasher.shutdown()
+
+
+async def test_hash_and_verify():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    try:
+        password_hash, timing = await hasher.hash("secret")
+        assert timing.hash_ms > 0
+        assert (await hasher.verify("secret", password_hash))[0]
+        assert not (await hasher.verify("wrong", password_hash))[0]
+        assert hasher.in_flight == 0
+    finally:
+        hasher.shutdown()
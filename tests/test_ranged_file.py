@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from ranged_file import RangedFileResponse, _etag_matches, _parse_range
+
+LAST_MODIFIED = datetime(2024, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+LAST_MODIFIED_HTTP = "Wed, 01 May 2024 12:00:00 GMT"
+STRONG = '"abc123"'
+WEAK = 'W/"abc123"'
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-199", (100, 199)),
+    ("bytes=0-0", (0, 0)),
+    # Open-ended: to the end of the file
+    ("bytes=900-", (900, 999)),
+    # Suffix: the last N bytes, or the whole file when N exceeds it
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    # An end past the file is clamped
+    ("bytes=500-5000", (500, 999)),
+    (" bytes=1-2 ", (1, 2)),
+])
+def test_parse_range_satisfiable(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=1000-",
+    "bytes=1000-1100",
+    "bytes=-0",
+])
+def test_parse_range_unsatisfiable(header):
+    assert _parse_range(header, 1000) is False
+
+
+@pytest.mark.parametrize("header", [
+    # Reversed ranges are invalid, so the header is ignored
+    "bytes=200-100",
+    "bytes=-",
+    "bytes=0-99,200-299",
+    "items=0-99",
+    "bytes=abc-",
+])
+def test_parse_range_ignored(header):
+    assert _parse_range(header, 1000) is None
+
+
+def test_parse_range_empty_file():
+    assert _parse_range("bytes=0-", 0) is False
+    assert _parse_range("bytes=-10", 0) is False
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"abc123"', True),
+    ('W/"abc123"', True),
+    ('"other", "abc123"', True),
+    ('*', True),
+    ('"other"', False),
+])
+def test_etag_matches_is_weak(header, matches):
+    assert _etag_matches(header, STRONG) is matches
+    assert _etag_matches(header, WEAK) is matches
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, False),
+    ({"if-none-match": STRONG}, True),
+    ({"if-none-match": '"other"'}, False),
+    ({"if-modified-since": LAST_MODIFIED_HTTP}, True),
+    ({"if-modified-since": "Thu, 02 May 2024 00:00:00 GMT"}, True),
+    ({"if-modified-since": "Tue, 30 Apr 2024 00:00:00 GMT"}, False),
+    ({"if-modified-since": "not a date"}, False),
+    # If-None-Match takes precedence over If-Modified-Since
+    ({"if-none-match": '"other"', "if-modified-since": LAST_MODIFIED_HTTP}, False),
+])
+def test_not_modified(headers, expected):
+    assert RangedFileResponse._not_modified(headers, STRONG, LAST_MODIFIED) is expected
+
+
+@pytest.mark.parametrize("if_range, etag, holds", [
+    (None, STRONG, True),
+    (STRONG, STRONG, True),
+    ('"other"', STRONG, False),
+    # If-Range needs a strong comparison: weak tags never match
+    (WEAK, WEAK, False),
+    (STRONG, WEAK, False),
+    (WEAK, STRONG, False),
+    (LAST_MODIFIED_HTTP, STRONG, True),
+    ("Thu, 02 May 2024 00:00:00 GMT", STRONG, False),
+    ("not a date", STRONG, False),
+])
+def test_if_range_holds(if_range, etag, holds):
+    assert RangedFileResponse._if_range_holds(if_range, etag, LAST_MODIFIED) is holds
+
+
+class _Request:
+    def __init__(self, headers, method='GET'):
+        self.headers = headers
+        self.method = method
+
+
+def _response(headers, etag=STRONG):
+    return RangedFileResponse(
+        None, "blobs/ab/abc", _Request(headers),
+        size=1000, media_type="text/plain", etag=etag, last_modified=LAST_MODIFIED, cache_control="private"
+    )
+
+
+def test_range_request_gets_partial_content():
+    response = _response({"range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 900-999/1000"
+    assert response.headers["content-length"] == "100"
+
+
+def test_unsatisfiable_range_gets_416():
+    response = _response({"range": "bytes=1000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1000"
+
+
+def test_stale_if_range_gets_whole_file():
+    response = _response({"range": "bytes=0-99", "if-range": '"other"'})
+    assert response.status_code == 200
+    assert response.headers["content-length"] == "1000"
@@ -0,0 +1,95 @@
+import pytest
+
+from signed_urls import UrlSigner, _b64decode, _b64encode
+
+FILE_DOC = {
+    "fileName": "blobs/ab/abcdef",
+    "userId": "user-1",
+    "originalName": "report.pdf",
+    "fileType": "application/pdf",
+    "sha256": "abcdef",
+    "fileSize": 2048,
+}
+NOW = 1_700_000_000  # a multiple of 100, so window boundaries are easy to read
+
+
+@pytest.fixture
+def signer():
+    return UrlSigner("secret", ttl=3600, window=100)
+
+
+def test_valid_token_round_trips(signer):
+    token, expires_at = signer.sign(FILE_DOC, now=NOW)
+    claims = signer.verify(token, now=NOW)
+    assert claims["f"] == FILE_DOC["fileName"]
+    assert claims["o"] == FILE_DOC["userId"]
+    assert claims["e"] == expires_at
+    assert "c" not in claims
+
+
+def test_codec_claims_only_for_compressed_files(signer):
+    token, _ = signer.sign({**FILE_DOC, "codec": "zstd"}, now=NOW)
+    claims = signer.verify(token, now=NOW)
+    assert claims["c"] == "zstd"
+    assert claims["z"] == 2048
+
+
+@pytest.mark.parametrize("offset, expected", [
+    # Rounded up to the next window boundary, then the TTL added
+    (0, NOW + 100 + 3600),
+    (1, NOW + 100 + 3600),
+    (99, NOW + 100 + 3600),
+    (100, NOW + 200 + 3600),
+])
+def test_expiry_rounds_up_to_the_window(signer, offset, expected):
+    _, expires_at = signer.sign(FILE_DOC, now=NOW + offset)
+    assert expires_at == expected
+
+
+def test_tokens_are_identical_within_a_window(signer):
+    assert signer.sign(FILE_DOC, now=NOW)[0] == signer.sign(FILE_DOC, now=NOW + 99)[0]
+    assert signer.sign(FILE_DOC, now=NOW)[0] != signer.sign(FILE_DOC, now=NOW + 100)[0]
+    assert signer.current_window(NOW + 99) == signer.current_window(NOW)
+
+
+def test_token_valid_for_between_ttl_and_ttl_plus_window(signer):
+    token, expires_at = signer.sign(FILE_DOC, now=NOW + 99)
+    assert signer.verify(token, now=NOW + 99 + 3600) is not None
+    assert signer.verify(token, now=expires_at - 1) is not None
+    assert signer.verify(token, now=expires_at) is None
+
+
+def test_expired_token_rejected(signer):
+    token, expires_at = signer.sign(FILE_DOC, now=NOW)
+    assert signer.verify(token, now=expires_at + 1) is None
+
+
+def test_tampered_payload_rejected(signer):
+    token, _ = signer.sign(FILE_DOC, now=NOW)
+    payload, signature = token.split('.')
+    claims = _b64decode(payload).replace(b"user-1", b"user-2")
+    assert signer.verify(f"{_b64encode(claims)}.{signature}", now=NOW) is None
+
+
+def test_extended_expiry_rejected(signer):
+    token, expires_at = signer.sign(FILE_DOC, now=NOW)
+    payload, signature = token.split('.')
+    claims = _b64decode(payload).replace(str(expires_at).encode(), str(expires_at + 10 ** 6).encode())
+    assert signer.verify(f"{_b64encode(claims)}.{signature}", now=NOW) is None
+
+
+@pytest.mark.parametrize("mangle", [
+    lambda token: token[:-2] + ("AA" if not token.endswith("AA") else "BB"),
+    lambda token: token.split('.')[0],
+    lambda token: token.split('.')[0] + '.',
+    lambda token: '.' + token.split('.')[1],
+    lambda token: "",
+])
+def test_malformed_token_rejected(signer, mangle):
+    token, _ = signer.sign(FILE_DOC, now=NOW)
+    assert signer.verify(mangle(token), now=NOW) is None
+
+
+def test_token_from_another_secret_rejected(signer):
+    token, _ = UrlSigner("other-secret", ttl=3600, window=100).sign(FILE_DOC, now=NOW)
+    assert signer.verify(token, now=NOW) is None
@@ -0,0 +1,101 @@
+import anyio
+import pytest
+
+from storage import LocalStorage, S3Storage
+
+pytestmark = pytest.mark.anyio
+
+BUCKET = "ecoleaf-test"
+
+
+def _source(tmp_path, name, data=b"stored content"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+async def _read(storage, key, offset=0):
+    def read():
+        body = storage.open(key, offset)
+        try:
+            return body.read()
+        finally:
+            body.close()
+    return await anyio.to_thread.run_sync(read)
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(tmp_path / 'store')
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    moto = pytest.importorskip("moto")
+    for name, value in (
+        ("AWS_ACCESS_KEY_ID", "testing"),
+        ("AWS_SECRET_ACCESS_KEY", "testing"),
+        ("AWS_DEFAULT_REGION", "us-east-1"),
+    ):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        storage = S3Storage(BUCKET, tmp_path, prefix="tenant", region="us-east-1")
+        storage._client.create_bucket(Bucket=BUCKET)
+        yield storage
+
+
+@pytest.fixture(params=['local', 's3'])
+def storage(request):
+    return request.getfixturevalue(request.param)
+
+
+async def test_put_stat_and_open(tmp_path, storage):
+    await storage.put('a/b.txt', _source(tmp_path, 'src'))
+
+    assert not (tmp_path / 'src').exists()
+    assert await storage.exists('a/b.txt')
+    assert (await storage.stat('a/b.txt')).size == 14
+    assert await _read(storage, 'a/b.txt') == b"stored content"
+    assert await _read(storage, 'a/b.txt', offset=7) == b"content"
+
+
+async def test_put_can_keep_the_source(tmp_path, storage):
+    source = _source(tmp_path, 'src')
+
+    await storage.put('kept.txt', source, keep_source=True)
+
+    assert source.read_bytes() == b"stored content"
+    assert await _read(storage, 'kept.txt') == b"stored content"
+
+
+async def test_missing_objects(storage):
+    assert not await storage.exists('missing.txt')
+    with pytest.raises(FileNotFoundError):
+        await storage.stat('missing.txt')
+    # Deleting something that is not there is not an error
+    await storage.delete('missing.txt')
+
+
+async def test_delete_and_delete_prefix(tmp_path, storage):
+    for key in ('.parts/u1/00001.part', '.parts/u1/00002.part', '.parts/u2/00001.part', 'file.txt'):
+        await storage.put(key, _source(tmp_path, 'src'))
+
+    await storage.delete('file.txt')
+    await storage.delete_prefix('.parts/u1/')
+
+    assert not await storage.exists('file.txt')
+    assert not await storage.exists('.parts/u1/00001.part')
+    assert not await storage.exists('.parts/u1/00002.part')
+    assert await storage.exists('.parts/u2/00001.part')
+
+
+async def test_local_keys_cannot_escape_the_root(local):
+    with pytest.raises(ValueError):
+        local.local_path('../outside.txt')
+
+
+async def test_s3_keys_are_prefixed(tmp_path, s3):
+    await s3.put('file.txt', _source(tmp_path, 'src'))
+
+    listed = s3._client.list_objects_v2(Bucket=BUCKET)['Contents']
+    assert [obj['Key'] for obj in listed] == ['tenant/file.txt']
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("mongomock_motor")
+httpx = pytest.importorskip("httpx")
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as client:
+        yield client
+
+
+async def test_failed_file_record_releases_the_blob(app, auth, client, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("insert failed")
+    monkeypatch.setattr(type(app.db.files), 'insert_one', fail)
+
+    response = await client.post('/api/files/upload', files={"file": ("a.txt", b"orphan")}, headers=auth('u1'))
+
+    assert response.status_code == 500
+    blob = await app.db.blobs.find_one({"fileSize": {"$exists": False}, "size": 6})
+    assert blob['refCount'] == 0
+    assert list(app.INCOMING_DIR.iterdir()) == []
+
+
+async def test_failed_blob_add_removes_the_staged_upload(app, auth, client, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("storage unavailable")
+    monkeypatch.setattr(app.blob_store.storage, 'put', fail)
+
+    response = await client.post('/api/files/upload', files={"file": ("b.txt", b"never stored")}, headers=auth('u1'))
+
+    assert response.status_code == 500
+    assert list(app.INCOMING_DIR.iterdir()) == []
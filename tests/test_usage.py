@@ -0,0 +1,68 @@
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from usage import UsageCounters
+
+pytestmark = pytest.mark.anyio
+
+
+class _FailingCounters(UsageCounters):
+    # Counters cannot be rebuilt from the source collections
+    async def rebuild(self, user_id, dry_run=False):
+        raise RuntimeError("rebuild unavailable")
+
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()['test']
+
+
+async def test_version_moves_when_the_counter_update_fails(db):
+    counters = _FailingCounters(db)
+    # $inc fails on a counter that is not a number
+    await db.user_usage.insert_one({"_id": "u1", "files": {}, "notesCount": "not a number", "version": 4})
+
+    await counters.notes_changed("u1", 1)
+
+    assert await counters.version("u1") == 5
+
+
+async def test_version_moves_when_counters_cannot_be_built(db):
+    counters = _FailingCounters(db)
+
+    await counters.notes_changed("u1", 1)
+
+    assert await counters.version("u1") == 1
+    # A document holding only the version is rebuilt on read
+    with pytest.raises(RuntimeError):
+        await counters.get("u1")
+
+
+
+class _UnwritableCollection:
+    # Reads pass through; every update fails, as with no reachable primary
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def update_one(self, *args, **kwargs):
+        raise RuntimeError("primary unavailable")
+
+
+class _UnwritableCounters(UsageCounters):
+    @property
+    def collection(self):
+        return _UnwritableCollection(self.db.user_usage)
+
+
+async def test_a_failed_version_bump_does_not_fail_the_write(db, caplog):
+    counters = _UnwritableCounters(db)
+    await db.user_usage.insert_one({"_id": "u1", "files": {}, "notesCount": 0, "version": 4})
+
+    await counters.notes_changed("u1", 1)
+
+    assert "cached responses may be stale" in caplog.text
+    assert await counters.version("u1") == 4